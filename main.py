@@ -1,14 +1,13 @@
 import sys
 import os
 
-import qdarktheme
 
-from PyQt5.QtWidgets import QApplication
-
-from urad import MainWindow
+def main():
+    # imported here, the acquisition process also loads this module
+    from PyQt5.QtWidgets import QApplication
 
+    from urad import MainWindow
 
-def main():
     os.environ["QT_AUTO_SCREEN_SCALE_FACTOR"] = "1"
 
     app = QApplication([])
@@ -17,6 +16,9 @@ def main():
     ex.setMinimumSize(1280, 720)
     ex.show()
 
+    # loaded once the window is up, like the plots
+    import qdarktheme
+
     app.setStyleSheet(qdarktheme.load_stylesheet("light"))
 
     sys.exit(app.exec())
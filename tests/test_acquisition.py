@@ -0,0 +1,80 @@
+import threading
+
+import numpy as np
+import pytest
+
+from urad.radar.acquisition import RadarAcquisition
+from urad.radar.device import URadDevice
+from urad.radar.emulator import DEFAULT_SCENE, Reflector
+from urad.stream import FrameSubscriber
+
+
+def _circular_spread(phases: np.ndarray) -> float:
+    return 1 - abs(np.mean(np.exp(1j * phases)))
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_acquisition_of_the_emulator(pipelined):
+    acquisition = RadarAcquisition("emulator", duration=1, pipelined=pipelined)
+    acquisition.run()
+
+    records, count, missed = acquisition.frame_block.read_since(0)
+    assert count > 20 and missed == 0
+    assert (np.diff(records["time"]) > 0).all()
+
+    # the strongest reflector is the peak of the range profile
+    dsp = acquisition.dsp
+    person = DEFAULT_SCENE[0]
+    peak = np.argmax(records["magnitude"][:, :dsp.n_fft // 2], axis=1)
+    assert (np.abs(peak - dsp.range_bin(person.distance)) <= 1).all()
+
+    # targets sorted by amplitude, each one the phase at its reflector's bin
+    target_phase = records["target_phase"]
+    assert np.isfinite(target_phase).all()
+    np.testing.assert_allclose(target_phase[:, 0], records["phase"])
+
+    spectrum = dsp.process(records["i"][-1], records["q"][-1]).spectrum
+    for phase, reflector in zip(target_phase[-1], DEFAULT_SCENE):
+        assert phase == pytest.approx(np.angle(spectrum[dsp.range_bin(reflector.distance)]))
+
+    # the breathing person moves, the wall does not
+    assert _circular_spread(target_phase[:, 1]) < 0.05
+    assert _circular_spread(target_phase[:, 0]) > 10 * _circular_spread(target_phase[:, 1])
+
+
+def test_bulk_and_separate_reads_decode_the_same_frame():
+    frames = []
+    for bulk_read in (False, True):
+        device = URadDevice("emulator", bulk_read=bulk_read)
+        device.ser.scene, device.ser.noise = (Reflector(2.0),), 0.0
+        device.open()
+        assert device.turn_on() == 0
+        assert device.configure(2, 5, 240, 101, 3, 100, 0, 0, 10, True, False, True, True, True, False) == 0
+
+        return_code, results, (I, Q) = device.detection()
+        assert return_code == 0
+        frames.append((results[:2], np.array(I), np.array(Q)))
+        device.close()
+
+    (results, I, Q), (bulk_results, bulk_I, bulk_Q) = frames
+    assert len(I) == 101
+    assert results[0] == bulk_results[0] and list(results[1]) == list(bulk_results[1])
+    np.testing.assert_array_equal(I, bulk_I)
+    np.testing.assert_array_equal(Q, bulk_Q)
+
+
+def test_published_frames_match_the_frame_block():
+    acquisition = RadarAcquisition("emulator", duration=1, publish="127.0.0.1:0")
+    port = acquisition.publisher.server.getsockname()[1]
+
+    # connected before the capture starts, so no batch is missed
+    with FrameSubscriber(f"127.0.0.1:{port}", timeout=10) as stream:
+        worker = threading.Thread(target=acquisition.run)
+        worker.start()
+        batches = list(stream)
+        worker.join()
+
+    records, count, _ = acquisition.frame_block.read_since(0)
+    assert stream.header["Ns_total"] == acquisition.recording_configuration()["Ns_total"]
+    assert stream.missed == 0 and stream.next_index == count
+    assert np.concatenate(batches).tobytes() == records.tobytes()
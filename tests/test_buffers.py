@@ -0,0 +1,81 @@
+import numpy as np
+
+from urad.buffers import MinMaxPyramid, RingBuffer, SharedRecordRing
+
+
+def test_ring_buffer_keeps_the_last_samples_in_order():
+    ring = RingBuffer(5)
+    for value in range(8):
+        ring.append(value)
+
+    assert ring.view().tolist() == [3, 4, 5, 6, 7]
+    assert ring.latest(2).tolist() == [6, 7]
+    assert len(ring) == 5
+    assert ring.count == 8
+
+
+def test_ring_buffer_extend_matches_append():
+    appended, extended = RingBuffer(7), RingBuffer(7)
+    values = np.arange(20.0)
+
+    for value in values:
+        appended.append(value)
+    extended.extend(values[:3])
+    extended.extend(values[3:15])
+    extended.extend(values[15:])
+
+    assert extended.view().tolist() == appended.view().tolist()
+    assert extended.count == appended.count == 20
+
+
+def test_ring_buffer_holds_arrays():
+    ring = RingBuffer(3, fill=np.nan, shape=(2,))
+    assert np.isnan(ring.view()).all()
+
+    ring.append([1.0, 2.0])
+    assert ring.latest(1).tolist() == [[1.0, 2.0]]
+    assert len(ring) == 1
+
+    ring.extend(np.arange(8.0).reshape(4, 2))
+    assert ring.view().tolist() == [[2, 3], [4, 5], [6, 7]]
+
+
+
+def test_min_max_pyramid_window():
+    pyramid = MinMaxPyramid(capacity=64, factor=4, levels=3)
+    times = np.arange(1000.0)
+    values = np.sin(times / 10)
+    pyramid.extend(times[:300], values[:300])
+    pyramid.extend(times[300:], values[300:])
+
+    # a short recent window holds the samples themselves
+    window_times, low, high = pyramid.window(990, 999, 100)
+    assert window_times.tolist() == times[990:].tolist()
+    assert low.tolist() == high.tolist() == values[990:].tolist()
+
+    # the whole capture from a coarser level, peaks kept
+    window_times, low, high = pyramid.window(0, 999, 100)
+    assert len(window_times) <= 100 and window_times[0] == 0
+    assert low.min() == values.min() and high.max() == values.max()
+
+
+def test_shared_record_ring_detach_keeps_the_records():
+    dtype = np.dtype([("time", "<f8"), ("phase", "<f8")])
+    writer = SharedRecordRing(8, dtype)
+    reader = SharedRecordRing(8, dtype, writer.name)
+
+    for i in range(5):
+        writer.next_record()["time"] = i
+        writer.commit()
+
+    reader.detach()
+    writer.close(unlink=True)
+
+    assert reader.memory is None
+    records, count, missed = reader.read_since(2)
+    assert records["time"].tolist() == [2, 3, 4]
+    assert (count, missed) == (5, 0)
+    assert reader.latest()[1] == 5
+
+    reader.close()
+    reader.detach()
@@ -0,0 +1,73 @@
+import numpy as np
+
+from urad.recording import BinaryRecorder, CSVRecorder, frame_dtype, read_recording
+
+
+def test_binary_session_round_trip(tmp_path):
+    configuration = {"mode": 2, "Ns": 200, "Ns_total": 200, "n_fft": 256, "Ntar": 3, "ultrasonic": True}
+    dtype = frame_dtype(200, 256, 3)
+
+    rng = np.random.default_rng(0)
+    batches = []
+    for size in (1, 5, 40):
+        records = np.zeros(size, dtype=dtype)
+        for name in dtype.names:
+            records[name] = rng.normal(size=records[name].shape)
+        batches.append(records)
+
+    recorder = BinaryRecorder(str(tmp_path), configuration, name="radar1")
+    recorder.start()
+    for records in batches:
+        recorder.write_frames(records)
+    recorder.close()
+    recorder.join(5)
+
+    header, records = read_recording(recorder.path())
+    assert recorder.path().endswith(f"DATA_RADAR1_{recorder.date}.urad")
+    assert header["Ns_total"] == 200 and header["name"] == "radar1"
+    assert header["clock"] == "monotonic"
+    assert records.dtype == dtype
+    assert records.tobytes() == np.concatenate(batches).tobytes()
+
+
+def test_binary_session_without_frames(tmp_path):
+    recorder = BinaryRecorder(str(tmp_path), {}, dtype=np.dtype([("time", "<f8"), ("ultrasonik", "<f8")]))
+    recorder.start()
+    recorder.close()
+    recorder.join(5)
+
+    header, records = read_recording(recorder.path())
+    assert len(records) == 0
+    assert records.dtype.names == ("time", "ultrasonik")
+
+
+def test_recorder_keeps_its_error_and_drops_what_follows(tmp_path):
+    recorder = CSVRecorder(str(tmp_path / "missing"), maxsize=2, flush_interval=0.05)
+    recorder.start()
+
+    records = np.zeros(4, dtype=[("time", "<f8")])
+    recorder.write_frames(records)
+    recorder.join(5)
+
+    assert isinstance(recorder.error, FileNotFoundError)
+
+    # neither blocks on the full queue of the stopped thread
+    for _ in range(10):
+        recorder.write_frames(records)
+    recorder.close()
+
+
+def test_binary_session_ends_in_a_partial_record(tmp_path):
+    dtype = np.dtype([("time", "<f8"), ("ultrasonik", "<f8")])
+    recorder = BinaryRecorder(str(tmp_path), {}, dtype=dtype)
+    recorder.start()
+    recorder.write_frames(np.ones(3, dtype=dtype))
+    recorder.close()
+    recorder.join(5)
+
+    # what a capture still running, or killed, leaves behind
+    with open(recorder.path(), "ab") as f:
+        f.write(b"\0" * (dtype.itemsize - 3))
+
+    header, records = read_recording(recorder.path())
+    assert records["time"].tolist() == [1.0, 1.0, 1.0]
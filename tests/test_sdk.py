@@ -0,0 +1,51 @@
+import math
+
+import numpy as np
+import pytest
+
+from urad import uRAD_USB_SDK11
+
+
+def reference_decode(buffer: bytes, mode: int, Ns: int) -> list:
+    """
+    The per-sample loop the SDK unpacked an I or Q buffer with before
+    ``decodeIQ``: two 12-bit samples per 3 bytes, every ramp padded to an
+    even number of samples
+    """
+    Ns_3 = math.ceil(0.75 * Ns)
+    blocks = [Ns]
+    if mode == 3 or mode == 4:
+        blocks.append(Ns)
+    if mode == 4:
+        blocks += [Ns_3, Ns_3]
+
+    samples = []
+    triplet = 0
+    for Ns_block in blocks:
+        for i in range((Ns_block + 1) // 2):
+            b0, b1, b2 = buffer[triplet * 3:triplet * 3 + 3]
+            samples.append((b0 << 4) + (b1 >> 4))
+            if i * 2 + 1 <= Ns_block - 1:
+                samples.append(((b1 & 15) << 8) + b2)
+            triplet += 1
+
+    return samples
+
+
+@pytest.mark.parametrize("mode", [2, 3, 4])
+@pytest.mark.parametrize("Ns", [50, 51, 99, 100, 125, 199, 200])
+def test_decode_iq_matches_reference(mode, Ns):
+    blocks = uRAD_USB_SDK11.iqBlocks(mode, Ns)
+    total_bytes = uRAD_USB_SDK11.iqBytes(blocks)
+    buffer = np.random.default_rng(Ns * 10 + mode).integers(0, 256, total_bytes, dtype=np.uint8).tobytes()
+
+    expected = reference_decode(buffer, mode, Ns)
+    assert total_bytes == (len(expected) + sum(block % 2 for block in blocks)) * 3 // 2
+
+    samples = uRAD_USB_SDK11.decodeIQ(buffer, blocks)
+    assert samples.tolist() == expected
+
+    out = np.empty(sum(blocks), dtype=np.uint16)
+    result = uRAD_USB_SDK11.decodeIQ(bytearray(buffer), blocks, out=out)
+    assert out.tolist() == expected
+    assert np.shares_memory(result, out)
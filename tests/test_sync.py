@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from urad.sync import align, unique_samples
+
+TIMES = [1.0, 2.0, 3.0]
+VALUES = [10.0, 20.0, 30.0]
+
+
+def test_align_nearest_holds_the_ends():
+    aligned = align([0.0, 1.4, 1.6, 5.0, 20.0], TIMES, VALUES)
+    assert aligned.tolist() == [10.0, 10.0, 20.0, 30.0, 30.0]
+
+
+def test_align_nearest_within_tolerance():
+    aligned = align([0.0, 1.4, 2.9, 5.0], TIMES, VALUES, tolerance=0.5)
+    np.testing.assert_array_equal(aligned, [np.nan, 10.0, 30.0, np.nan])
+
+
+def test_align_linear_is_nan_outside_the_stream():
+    aligned = align([0.0, 1.5, 2.75, 3.0, 5.0], TIMES, VALUES, "linear")
+    np.testing.assert_array_equal(aligned, [np.nan, 15.0, 27.5, 30.0, np.nan])
+
+
+def test_align_empty_stream():
+    assert np.isnan(align([1.0, 2.0], [], [])).all()
+    assert np.isnan(align([1.0, 2.0], [], [], "linear")).all()
+
+
+def test_align_unknown_method():
+    with pytest.raises(ValueError):
+        align([1.0], TIMES, VALUES, "cubic")
+
+
+def test_unique_samples_keeps_each_reading_once():
+    times, values = unique_samples([np.nan, 1.0, 1.0, 2.0, 2.0, 2.0], [0.0, 10.0, 10.0, 20.0, 20.0, 20.0])
+    assert times.tolist() == [1.0, 2.0]
+    assert values.tolist() == [10.0, 20.0]
@@ -0,0 +1,48 @@
+import time
+
+import serial
+
+from urad.radar import ultrasonic
+from urad.radar.ultrasonic import UltrasonicSensor
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_every_line_is_a_reading_with_its_own_time(monkeypatch):
+    # pyserial's loopback port echoes what is written to it
+    monkeypatch.setattr(ultrasonic.serial, "Serial", serial.serial_for_url)
+    sensor = UltrasonicSensor("loop://", history=64)
+    try:
+        sensor.device.write(b"10.0\n11.0\nabc\n12.0\n1")
+        _wait_for(lambda: sensor.samples == 3)
+
+        records, count, _ = sensor.readings.read_since(0)
+        assert records["ultrasonik"].tolist() == [10.0, 11.0, 12.0]
+        assert (records["time"][1:] >= records["time"][:-1]).all()
+        assert sensor.parse_errors == 1
+        assert sensor.read_stamped() == (records["time"][-1], 12.0)
+
+        # the partial line completes with the next read
+        sensor.device.write(b"3.5\n")
+        _wait_for(lambda: sensor.samples == 4)
+        assert sensor.read() == 13.5
+    finally:
+        sensor.stop()
+
+
+def test_lines_of_one_read_are_back_dated_by_their_bytes(monkeypatch):
+    monkeypatch.setattr(ultrasonic.serial, "Serial", serial.serial_for_url)
+    sensor = UltrasonicSensor("loop://", history=64)
+    sensor.stop()
+
+    received = time.monotonic() + 100
+    sensor._parse(b"10.0\n11.0\n12.0\n", received)
+
+    records, _, _ = sensor.readings.read_since(0)
+    byte_time = 10 / sensor.device.baudrate
+    assert records["ultrasonik"].tolist() == [10.0, 11.0, 12.0]
+    assert records["time"].tolist() == [received - 10 * byte_time, received - 5 * byte_time, received]
@@ -0,0 +1,48 @@
+import math
+
+import numpy as np
+
+from urad.radar.vitals import SlidingDFT, VitalSignEstimator
+
+
+def test_sliding_dft_matches_fft_of_the_window():
+    window, bins = 64, np.array([1, 3, 7, 20])
+    x = np.random.default_rng(0).normal(size=300)
+    dft = SlidingDFT(window, bins)
+
+    for n, value in enumerate(x, 1):
+        dft.update(value)
+        if n >= window:
+            expected = np.fft.fft(x[n - window:n])[bins]
+            np.testing.assert_allclose(dft.X, expected, atol=1e-9)
+
+    assert dft.is_full
+
+
+def test_vital_signs_follow_time_stamps_across_missing_frames():
+    rng = np.random.default_rng(1)
+    times = np.cumsum(rng.uniform(0.015, 0.035, 4000))
+    times = times[rng.random(len(times)) > 0.4]
+    phase = 2 * np.sin(2 * np.pi * 0.25 * times) + 0.3 * np.sin(2 * np.pi * 1.2 * times)
+
+    estimator = VitalSignEstimator(40.0)
+    for value, timestamp in zip(np.angle(np.exp(1j * phase)), times):
+        estimator.update(value, timestamp)
+
+    respiration, cardiac = estimator.rates()
+    assert abs(respiration - 15) < 1
+    assert abs(cardiac - 72) < 2
+
+
+def test_vital_signs_start_over_after_a_long_gap():
+    estimator = VitalSignEstimator(100.0, window_sec=10)
+    times = np.arange(0, 12, 0.01)
+    for timestamp in times:
+        estimator.update(np.sin(timestamp), timestamp)
+    assert estimator.dft.is_full
+
+    # nobody in front of the radar for an hour, not 360000 samples to catch up
+    estimator.update(0.0, times[-1] + 3600)
+
+    assert estimator.dft.samples.count == 1
+    assert all(math.isnan(rate) for rate in estimator.rates())
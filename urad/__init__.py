@@ -1 +1,15 @@
-from .gui import MainWindow
+"""
+uRAD radar acquisition application.
+
+``MainWindow`` is imported on first use, so importing a submodule such as
+``urad.recording`` does not load the GUI.
+"""
+__all__ = ["MainWindow"]
+
+
+def __getattr__(name: str):
+    if name == "MainWindow":
+        from urad.gui import MainWindow
+        return MainWindow
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
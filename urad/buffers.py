@@ -0,0 +1,323 @@
+import threading
+import typing
+
+import numpy as np
+
+from urad.sync import align
+
+
+class RingBuffer:
+    """
+    Fixed capacity history of samples, written in place.
+
+    Every sample is stored twice, ``capacity`` apart, so the last
+    ``capacity`` samples are always one contiguous slice of the storage and
+    ``view`` never has to copy. The view is live: it shows later writes.
+    A sample may itself be an array of ``shape``, e.g. a whole spectrum.
+    """
+    def __init__(self,
+                 capacity: int,
+                 dtype: typing.Any = np.float64,
+                 fill: float = 0.0,
+                 shape: typing.Tuple[int, ...] = ()
+                 ) -> None:
+        self.capacity = capacity
+        self._data = np.full((2 * capacity, *shape), fill, dtype=dtype)
+        self._index = 0
+        self.count = 0
+
+    @classmethod
+    def from_duration(cls, seconds: float, sample_rate: float, **kwargs) -> "RingBuffer":
+        return cls(max(1, int(round(seconds * sample_rate))), **kwargs)
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def append(self, value: float) -> None:
+        self._data[self._index] = value
+        self._data[self._index + self.capacity] = value
+        self._index = (self._index + 1) % self.capacity
+        self.count += 1
+
+    def extend(self, values: np.ndarray) -> None:
+        values = np.asarray(values)
+        self.count += len(values)
+
+        values = values[-self.capacity:]
+        n = len(values)
+        if not n:
+            return
+
+        positions = (self._index + np.arange(n)) % self.capacity
+        self._data[positions] = values
+        self._data[positions + self.capacity] = values
+        self._index = (self._index + n) % self.capacity
+
+    def view(self) -> np.ndarray:
+        """
+        The whole buffer from oldest to newest sample
+        """
+        return self._data[self._index:self._index + self.capacity]
+
+    def latest(self, n: int) -> np.ndarray:
+        n = min(n, self.capacity)
+        end = self._index + self.capacity
+        return self._data[end - n:end]
+
+
+class TimeSeriesBuffer:
+    """
+    The last ``capacity`` samples of one stream with the host time each one
+    was received at, for aligning streams with ``urad.sync.align``.
+    Appends may come from another thread than the reads.
+    """
+    def __init__(self, capacity: int, dtype: typing.Any = np.float64) -> None:
+        self.times = RingBuffer(capacity, np.float64, fill=np.nan)
+        self.values = RingBuffer(capacity, dtype, fill=np.nan)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, timestamp: float, value: float) -> None:
+        with self._lock:
+            self.times.append(timestamp)
+            self.values.append(value)
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        with self._lock:
+            self.times.extend(timestamps)
+            self.values.extend(values)
+
+    def latest(self, n: int) -> np.ndarray:
+        """
+        Copy of the last ``n`` values, NaN before the first sample
+        """
+        with self._lock:
+            return self.values.latest(n).copy()
+
+    def snapshot(self) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Copies of the stored times and values, oldest first
+        """
+        with self._lock:
+            n = len(self.times)
+            return self.times.latest(n).copy(), self.values.latest(n).copy()
+
+    def at(self, query_times: np.ndarray, method: str = "nearest", tolerance: typing.Optional[float] = None) -> np.ndarray:
+        times, values = self.snapshot()
+        return align(query_times, times, values, method, tolerance)
+
+
+class RecordRing:
+    """
+    Preallocated block of fixed-size records handed from one thread to
+    another without a copy per record.
+
+    The writer fills ``next_record`` in place and ``commit``s it; a reader
+    copies everything committed since its last read with ``read_since``.
+    When the reader falls more than ``capacity - 1`` records behind, the
+    oldest ones are overwritten and reported as missed.
+    """
+    def __init__(self, capacity: int, dtype: np.dtype) -> None:
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+
+        self._data = np.zeros(capacity, dtype=self.dtype)
+        self._lock = threading.Lock()
+
+    def next_record(self) -> np.ndarray:
+        """
+        Writable view of the record the next ``commit`` publishes
+        """
+        return self._data[self.count % self.capacity, ...]
+
+    def commit(self) -> None:
+        with self._lock:
+            self.count += 1
+
+    def latest(self) -> typing.Tuple[typing.Optional[np.ndarray], int]:
+        """
+        Copy of the newest record, None before the first commit, and the
+        record count
+        """
+        with self._lock:
+            count = self.count
+            if not count:
+                return None, count
+            return self._data[(count - 1) % self.capacity].copy(), count
+
+    def read_since(self, since: int) -> typing.Tuple[np.ndarray, int, int]:
+        """
+        Copy of the records committed after the first ``since``, the count
+        to pass next time and how many records were overwritten unread
+        """
+        with self._lock:
+            count = self.count
+            # the slot after the newest record may be half written
+            start = max(since, count - self.capacity + 1)
+            records = self._data[np.arange(start, count) % self.capacity]
+
+        return records, count, start - since
+
+
+class MinMaxPyramid:
+    """
+    Long history of one stream at several resolutions, for plotting any
+    time window with a bounded number of points.
+
+    Level 0 holds the samples themselves; every level above holds the
+    time, minimum and maximum of ``factor`` entries of the level below, so
+    peaks survive the decimation. Levels are built as the samples arrive
+    and each keeps ``capacity`` entries: a level covers ``factor`` times
+    the span of the level below.
+    """
+    def __init__(self, capacity: int = 65536, factor: int = 8, levels: int = 5) -> None:
+        self.factor = factor
+
+        values = RingBuffer(capacity, fill=np.nan)
+        self.levels = [(RingBuffer(capacity, fill=np.nan), values, values)]
+        for _ in range(levels - 1):
+            self.levels.append(tuple(RingBuffer(capacity, fill=np.nan) for _ in range(3)))
+
+        # entries of every level waiting for a full bucket of the next one
+        self._pending = [(np.empty(0), np.empty(0), np.empty(0)) for _ in self.levels]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.levels[0][0].count
+
+    def append(self, timestamp: float, value: float) -> None:
+        self.extend([timestamp], [value])
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        times = np.asarray(timestamps, dtype=np.float64)
+        low = high = np.asarray(values, dtype=np.float64)
+
+        with self._lock:
+            for level, (level_times, level_low, level_high) in enumerate(self.levels):
+                if level:
+                    pending = self._pending[level]
+                    times, low, high = (np.concatenate([p, new]) for p, new in zip(pending, (times, low, high)))
+
+                    n = len(times) // self.factor * self.factor
+                    self._pending[level] = (times[n:], low[n:], high[n:])
+                    times = times[:n:self.factor]
+                    low = low[:n].reshape(-1, self.factor).min(axis=1)
+                    high = high[:n].reshape(-1, self.factor).max(axis=1)
+
+                if not len(times):
+                    break
+
+                level_times.extend(times)
+                level_low.extend(low)
+                if level:
+                    level_high.extend(high)
+
+    def window(self, start: float, end: float, max_points: int) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Times, minima and maxima of the finest level that covers
+        ``start``..``end`` with at most ``max_points`` entries
+        """
+        with self._lock:
+            for level, (level_times, level_low, level_high) in enumerate(self.levels):
+                n = len(level_times)
+                times = level_times.latest(n)
+                first, last = np.searchsorted(times, [start, end], side="right")
+                first = max(first - 1, 0)
+
+                covers = n < level_times.capacity or times[0] <= start
+                coarsest = level == len(self.levels) - 1 or not len(self.levels[level + 1][0])
+                if (covers and last - first <= max_points) or coarsest:
+                    return (
+                        times[first:last].copy(),
+                        level_low.latest(n)[first:last].copy(),
+                        level_high.latest(n)[first:last].copy(),
+                    )
+
+        return np.empty(0), np.empty(0), np.empty(0)
+
+
+class SharedRecordRing(RecordRing):
+    """
+    ``RecordRing`` in shared memory, written by one process and read by
+    others. The record count is stored in front of the records.
+
+    Without a lock across processes, a reader checks the count again once
+    it has copied the records and drops the ones the writer may have
+    reused in the meantime, as missed. ``name`` attaches to the ring of
+    another process; ``detach`` lets go of it once the writer is done.
+    """
+    def __init__(self, capacity: int, dtype: np.dtype, name: typing.Optional[str] = None) -> None:
+        from multiprocessing import shared_memory
+
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+
+        # the count takes 64 bytes, the records stay aligned
+        size = 64 + capacity * self.dtype.itemsize
+        self.memory = shared_memory.SharedMemory(name, create=name is None, size=size)
+        self.name = self.memory.name
+        self._count = np.ndarray(1, np.int64, self.memory.buf)
+        self._data = np.ndarray(capacity, self.dtype, self.memory.buf, offset=64)
+
+        # every view of the memory is taken under the lock, so that
+        # detach never unmaps it under a reader
+        self._lock = threading.RLock()
+
+    @property
+    def count(self) -> int:
+        with self._lock:
+            return int(self._count[0])
+
+    @count.setter
+    def count(self, value: int) -> None:
+        self._count[0] = value
+
+    def latest(self) -> typing.Tuple[typing.Optional[np.ndarray], int]:
+        while True:
+            with self._lock:
+                record, count = super().latest()
+                if self.count - count < self.capacity - 1:
+                    return record, count
+
+    def read_since(self, since: int) -> typing.Tuple[np.ndarray, int, int]:
+        with self._lock:
+            records, count, missed = super().read_since(since)
+            reused = min(self.count - self.capacity + 1 - (count - len(records)), len(records))
+
+        if reused > 0:
+            records = records[reused:]
+            missed += reused
+
+        return records, count, missed
+
+    def detach(self) -> None:
+        """
+        Unmap the ring of a writer that is done, keeping a copy of its
+        records for the readers still to come
+        """
+        with self._lock:
+            if self.memory is None or self._data is None:
+                return
+
+            self._count = self._count.copy()
+            self._data = self._data.copy()
+            self.memory.close()
+            self.memory = None
+
+    def close(self, unlink: bool = False) -> None:
+        """
+        Unmap the ring, and free it once every process has with ``unlink``
+        """
+        with self._lock:
+            if self._data is None:
+                return
+
+            # the views must go before the memory can be closed
+            self._count = self._data = None
+            if self.memory is not None:
+                self.memory.close()
+                if unlink:
+                    self.memory.unlink()
@@ -0,0 +1,172 @@
+"""
+Headless radar capture, without Qt or matplotlib:
+
+    python -m urad.capture --port COM7 --duration 3600 --format binary --out D:/data
+
+The radar runs on the main thread and every frame batch is handed to the
+same recorders the dashboard uses; Ctrl+C stops the capture and closes the
+files. ``--port emulator`` captures from the software radar. Several ports
+(``--port COM7 COM9 --ultrasonic COM8 COM10``) are captured together by a
+``DeviceManager``, one session file per device.
+"""
+import argparse
+import functools
+import os
+import signal
+import sys
+import typing
+
+from urad.radar.acquisition import PROFILES, RadarAcquisition
+from urad.radar.manager import DeviceManager, split_ports
+from urad.recording import BinaryRecorder, CSVRecorder, Recorder, session_date
+
+FORMATS = ("csv", "binary", "raw")
+
+
+class Capture:
+    """
+    Stream the frames of a ``RadarAcquisition``, of a ``RadarProcess``
+    with ``separate_process``, or of every device of a ``DeviceManager``,
+    to disk from its callbacks
+    """
+    def __init__(self,
+                 port: typing.Union[str, typing.Sequence[str]],
+                 directory: str,
+                 record_format: str = "binary",
+                 duration: float = 0,
+                 profile: str = "default",
+                 ultrasonic_port: typing.Union[str, typing.Sequence[str]] = "",
+                 pipelined: bool = False,
+                 n_fft: typing.Optional[int] = None,
+                 publish: typing.Optional[str] = None,
+                 separate_process: bool = False,
+                 verbose: bool = True
+                 ) -> None:
+        self.directory = directory
+        self.record_format = record_format
+        self.verbose = verbose
+
+        self.recorders: typing.Dict[str, Recorder] = {}
+        self.date = session_date()
+        self.frames = 0
+        self.missed = 0
+        self.error: typing.Optional[Exception] = None
+        self._frames_read: typing.Dict[str, int] = {}
+
+        ports, ultrasonic_ports = split_ports(port), split_ports(ultrasonic_port)
+        if len(ports) > 1 or len(ultrasonic_ports) > 1:
+            acquisition = functools.partial(DeviceManager, separate_process=separate_process)
+        else:
+            ports, ultrasonic_ports = ports[0], "".join(ultrasonic_ports)
+            if separate_process:
+                from urad.radar.process import RadarProcess as acquisition
+            else:
+                acquisition = RadarAcquisition
+
+        self.acquisition = acquisition(
+            ports, ultrasonic_ports, duration, PROFILES[profile],
+            pipelined=pipelined,
+            n_fft=n_fft,
+            publish=publish,
+            raw_capture=directory if record_format == "raw" else None,
+            on_frames=self._record_frames,
+            on_frame_rate=self._show_frame_rate,
+            on_vital_signs=self._show_vital_signs,
+        )
+        self.streams = self.acquisition.streams()
+
+        # ports of the radars that did not open or take their configuration
+        radars = self.acquisition.radars if isinstance(self.acquisition, DeviceManager) else [self.acquisition]
+        self.failed = [port for port, radar in zip(split_ports(port), radars) if radar.frame_block is None]
+
+    def _record_frames(self, count: int) -> None:
+        for name, (stream, configuration) in self.streams.items():
+            records, self._frames_read[name], missed = stream.read_since(self._frames_read.get(name, 0))
+            self.missed += missed
+            if not len(records):
+                continue
+
+            if name not in self.recorders:
+                if self.record_format == "binary":
+                    recorder = BinaryRecorder(self.directory, configuration, stream.dtype, name=name, date=self.date)
+                else:
+                    recorder = CSVRecorder(self.directory, name=name, date=self.date)
+                recorder.start()
+                self.recorders[name] = recorder
+
+            self.recorders[name].write_frames(records)
+            if self._recording_failed(self.recorders[name]):
+                # nothing is saved any more
+                self.stop()
+                return
+
+            if "phase" in records.dtype.names:
+                self.frames += len(records)
+
+    def _recording_failed(self, recorder: Recorder) -> bool:
+        if recorder.error is not None and self.error is None:
+            self.error = recorder.error
+            print(f"Data tidak dapat disimpan ke {self.directory}: {recorder.error}", file=sys.stderr)
+
+        return self.error is not None
+
+    def _show_frame_rate(self, fps: float, serial_fps: float) -> None:
+        if self.verbose:
+            print(f"{fps:6.1f} frame/s  {self.frames} frame tersimpan", file=sys.stderr)
+
+    def _show_vital_signs(self, breaths: float, beats: float) -> None:
+        if self.verbose:
+            print(f"napas {breaths:.0f} /menit  detak {beats:.0f} /menit", file=sys.stderr)
+
+    def stop(self, *args) -> None:
+        self.acquisition.is_taking_data = False
+
+    def run(self) -> None:
+        for port in self.failed:
+            print(f"Radar {port} tidak dapat dibuka atau dikonfigurasi, pastikan port telah benar.", file=sys.stderr)
+
+        # the radars that are on still have to be switched off
+        if self.failed:
+            self.stop()
+
+        self.acquisition.run()
+
+        for recorder in self.recorders.values():
+            recorder.close()
+        for recorder in self.recorders.values():
+            recorder.join()
+            self._recording_failed(recorder)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Capture radar frames to disk without the GUI")
+    parser.add_argument("--port", nargs="+", required=True, help="uRAD serial ports, or 'emulator'")
+    parser.add_argument("--ultrasonic", nargs="*", default=[], help="serial ports of the ultrasonic sensors")
+    parser.add_argument("--duration", type=float, default=0, help="seconds, 0 until Ctrl+C")
+    parser.add_argument("--profile", choices=list(PROFILES), default="default")
+    parser.add_argument("--format", choices=FORMATS, default="binary")
+    parser.add_argument("--out", default=".", help="directory of the recording")
+    parser.add_argument("--pipelined", action="store_true", help="request frames on a reader thread")
+    parser.add_argument("--n-fft", type=int, help="FFT length to zero-pad to")
+    parser.add_argument("--publish", metavar="ADDRESS", help="also serve the frames on host:port or a Unix socket")
+    parser.add_argument("--processes", action="store_true", help="one process per radar instead of a thread")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+
+    capture = Capture(
+        args.port, args.out, args.format, args.duration, args.profile,
+        args.ultrasonic, args.pipelined, args.n_fft, args.publish, args.processes, not args.quiet
+    )
+    signal.signal(signal.SIGINT, capture.stop)
+    capture.run()
+
+    if capture.missed:
+        print(f"{capture.missed} frame tidak tersimpan", file=sys.stderr)
+    if capture.failed or capture.error is not None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,14 @@
+import math
 import time
 import os
 import json
+import typing
 
-from serial.tools.list_ports import comports
+# the canvases moved to urad.plots, which loads matplotlib
+_PLOTS = ("BlitCanvas", "PlotCanvas", "WaterfallCanvas", "HistoryCanvas")
 
-from PyQt5.QtCore import QThread, pyqtSignal
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-#  from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as PlotNavBar
+# plot refreshes per second the dashboard accepts
+RENDER_FPS_RANGE = (1.0, 120.0)
 
 
 def list_com_port(get_first_port: bool = False) ->  str:
@@ -15,6 +16,8 @@ def list_com_port(get_first_port: bool = False) ->  str:
     Scan all COM port available on the device,
     and return it as a string
     """
+    from serial.tools.list_ports import comports
+
     ports = comports()
 
     if not ports:
@@ -28,98 +31,158 @@ def list_com_port(get_first_port: bool = False) ->  str:
 
     return ports.split(":")[0]
 
-def get_scale_plot():
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "dialogs", "settings.json")
+
+
+class Settings:
     """
-    Read data for the default value: application setting
+    The application settings file, parsed once and kept in memory.
+
+    The file is reloaded when its modification time changes, checked at
+    most once every ``check_interval`` seconds so the getters called on
+    every redraw touch no file, or right after ``save``.
     """
-    file_path = "./urad/dialogs"
-    try:
-        with open(os.path.join(file_path, "settings.json"), "r") as f:
-            setting_data: dict = json.loads(f.read())
+    def __init__(self, path: str = SETTINGS_PATH, check_interval: float = 1.0) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self.exists = False
 
-            phase_max = setting_data.get("phase_max")
-            phase_min = setting_data.get("phase_min")
-            mag_max = setting_data.get("mag_max")
-            mag_min = setting_data.get("mag_min")
+        self._data: dict = {}
+        self._mtime: typing.Optional[int] = None
+        self._checked_at: typing.Optional[float] = None
 
-            return phase_max, phase_min, mag_max, mag_min
+    def _modified(self) -> typing.Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
 
-    except FileNotFoundError:
-        return ""
+    def _reload(self, mtime: typing.Optional[int]) -> None:
+        try:
+            with open(self.path, "r") as f:
+                self._data = json.loads(f.read())
+            self.exists = True
+        except FileNotFoundError:
+            self._data = {}
+            self.exists = False
 
+        self._mtime = mtime
 
-def get_port_setting():
+    def data(self) -> dict:
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            mtime = self._modified()
+            if mtime != self._mtime or not self.exists:
+                self._reload(mtime)
+
+        return self._data
+
+    def get(self, key: str, default: typing.Any = None) -> typing.Any:
+        return self.data().get(key, default)
+
+    def invalidate(self) -> None:
+        self._checked_at = None
+        self._mtime = None
+
+    def save(self, setting: dict) -> None:
+        with open(self.path, "w") as f:
+            f.write(json.dumps(setting))
+
+        self.invalidate()
+
+
+settings = Settings()
+
+
+def get_scale_plot():
     """
     Read data for the default value: application setting
     """
-    file_path = "./urad/dialogs"
-    try:
-        with open(os.path.join(file_path, "settings.json"), "r") as f:
-            setting_data: dict = json.loads(f.read())
+    settings.data()
+    if not settings.exists:
+        return ""
 
-            urad_port = str(setting_data.get("urad_port"))
-            ultrasonik_port = str(setting_data.get("ultrasonik_port"))
+    phase_max = settings.get("phase_max")
+    phase_min = settings.get("phase_min")
+    mag_max = settings.get("mag_max")
+    mag_min = settings.get("mag_min")
 
-            return urad_port, ultrasonik_port
+    return phase_max, phase_min, mag_max, mag_min
 
-    except FileNotFoundError:
-        return ""
 
-def get_path_setting():
+def get_port_setting():
     """
     Read data for the default value: application setting
     """
-    file_path = "./urad/dialogs"
-    try:
-        with open(os.path.join(file_path, "settings.json"), "r") as f:
-            setting_data: dict = json.loads(f.read())
+    settings.data()
+    if not settings.exists:
+        return ""
 
-            path_setting = str(setting_data.get("dir_path"))
+    urad_port = str(settings.get("urad_port"))
+    ultrasonik_port = str(settings.get("ultrasonik_port"))
 
-            return path_setting
+    return urad_port, ultrasonik_port
 
-    except FileNotFoundError:
+def get_path_setting():
+    """
+    Read data for the default value: application setting
+    """
+    settings.data()
+    if not settings.exists:
         return ""
 
-class Timer(QThread):
-    time_lapsed = pyqtSignal(str)
-    time_lapsed_sec = pyqtSignal(int)
+    path_setting = str(settings.get("dir_path"))
 
-    def __init__(self, sec_raw) -> None:
-        QThread.__init__(self)
+    return path_setting
 
-        self.start_ticking = True
-        self.pause_ticking = False
-        self.sec_remain = sec_raw
+def get_acquisition_setting():
+    """
+    Read data for the default value: application setting
+    """
+    pipelined = bool(settings.get("pipelined", False))
 
-    def _convert_time(self, sec_raw):
-        mins = sec_raw // 60
-        sec = sec_raw % 60
-        hours = mins // 60
-        mins = mins % 60
+    return pipelined
 
-        self.time_lapsed_sec.emit(sec_raw)
-        self.time_lapsed.emit(f"{int(hours):02}:{int(mins):02}:{int(sec):02}")
+def get_process_setting():
+    """
+    Read data for the default value: application setting
+    """
+    separate_process = bool(settings.get("separate_process", False))
 
-    def stop(self):
-        self.start_ticking = False
+    return separate_process
 
-    def run(self) -> None:
-        self.start_ticking = True
-        while self.start_ticking:
+def get_stream_setting():
+    """
+    Read data for the default value: application setting
+    """
+    stream_address = str(settings.get("stream_address", ""))
+
+    return stream_address
+
+def get_record_format():
+    """
+    Read data for the default value: application setting
+    """
+    record_format = str(settings.get("record_format", "csv"))
 
-            if self.pause_ticking:
-                continue
+    return record_format
 
-            self.sec_remain -= 1
-            self._convert_time(self.sec_remain)
-            time.sleep(1)
+def get_render_fps():
+    """
+    Read data for the default value: application setting, limited to
+    RENDER_FPS_RANGE
+    """
+    render_fps = float(settings.get("render_fps", 30.0))
+    if math.isnan(render_fps):
+        return 30.0
 
-class PlotCanvas(FigureCanvas):
-    def __init__(self) -> None:
-        self.figure = Figure(tight_layout=True)
-        self.figure.subplots_adjust(hspace=0)
+    low, high = RENDER_FPS_RANGE
+    return min(max(render_fps, low), high)
 
-        self.axes = self.figure.add_subplot(111)
-        super(PlotCanvas, self).__init__(self.figure)
+def __getattr__(name: str):
+    if name in _PLOTS:
+        from urad import plots
+        return getattr(plots, name)
 
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,15 +1,13 @@
-import os
-import json
 import typing
 
 from PyQt5.QtCore import pyqtSignal
 from PyQt5.QtWidgets import (
-    QDialog, QFileDialog, QFormLayout, QWidget, 
+    QCheckBox, QComboBox, QDialog, QFileDialog, QFormLayout, QWidget, 
     QGroupBox, QLineEdit, QPushButton,
     QTextEdit, QVBoxLayout
 )
 
-from urad.contrib import list_com_port
+from urad.contrib import list_com_port, settings
 
 
 class SettingDialog(QDialog):
@@ -28,6 +26,12 @@ class SettingDialog(QDialog):
 
         self.mag_max = str(setting.get("mag_max"))
         self.mag_min = str(setting.get("mag_min"))
+        self.render_fps = str(setting.get("render_fps", 30.0))
+
+        self.pipelined = bool(setting.get("pipelined", False))
+        self.separate_process = bool(setting.get("separate_process", False))
+        self.record_format = str(setting.get("record_format", "csv"))
+        self.stream_address = str(setting.get("stream_address", ""))
 
         layout = QVBoxLayout()
         layout.addWidget(self._form_group())
@@ -44,11 +48,30 @@ class SettingDialog(QDialog):
         urad_port = QLineEdit(self.urad_port, group_box)
         ultrasonik_port = QLineEdit(self.ultrasonik_port, group_box)
 
+        # several devices are captured together, on the same clock
+        urad_port.setToolTip("Beberapa radar dipisah koma, misal: COM7, COM9")
+        ultrasonik_port.setToolTip("Beberapa sensor dipisah koma, misal: COM8, COM10")
+
         phase_max = QLineEdit(self.phase_max, group_box)
         phase_min = QLineEdit(self.phase_min, group_box)
 
         mag_max = QLineEdit(self.mag_max, group_box)
         mag_min = QLineEdit(self.mag_min, group_box)
+        render_fps = QLineEdit(self.render_fps, group_box)
+
+        pipelined = QCheckBox(group_box)
+        pipelined.setChecked(self.pipelined)
+
+        separate_process = QCheckBox(group_box)
+        separate_process.setChecked(self.separate_process)
+
+        record_format = QComboBox(group_box)
+        record_format.addItems(["csv", "binary", "raw"])
+        record_format.setCurrentText(self.record_format)
+
+        # host:port or a Unix socket, empty to not serve the frames
+        stream_address = QLineEdit(self.stream_address, group_box)
+        stream_address.setPlaceholderText("127.0.0.1:5555")
 
         urad_port_list = QTextEdit(list_com_port(), group_box)
         save_button = QPushButton("Simpan Pengaturan", group_box)
@@ -70,8 +93,14 @@ class SettingDialog(QDialog):
         layout.addRow(QWidget())
         layout.addRow("Max Plot Mag", mag_max)
         layout.addRow("Min Plot Mag", mag_min)
+        layout.addRow("FPS Plot", render_fps)
+        layout.addRow(QWidget())
+        layout.addRow("Akuisisi Pipeline", pipelined)
+        layout.addRow("Akuisisi Proses Terpisah", separate_process)
         layout.addRow(QWidget())
         layout.addRow("Folder Data", dir_button)
+        layout.addRow("Format Data", record_format)
+        layout.addRow("Alamat Stream", stream_address)
         layout.addRow(QWidget())
         layout.addRow(urad_port_list)
         layout.addRow(save_button)
@@ -84,6 +113,11 @@ class SettingDialog(QDialog):
             self.phase_min = float(phase_min.text())
             self.mag_max = float(mag_max.text())
             self.mag_min = float(mag_min.text())
+            self.render_fps = float(render_fps.text())
+            self.pipelined = pipelined.isChecked()
+            self.separate_process = separate_process.isChecked()
+            self.record_format = record_format.currentText()
+            self.stream_address = stream_address.text()
 
             self._save_setting()
 
@@ -117,12 +151,7 @@ class SettingDialog(QDialog):
         """
         Read data for the default value: application setting
         """
-        file_path = os.path.dirname(os.path.realpath(__file__))
-        try:
-            with open(os.path.join(file_path, "settings.json"), "r") as f:
-                return json.loads(f.read())
-        except FileNotFoundError:
-            return {}
+        return dict(settings.data())
 
     def _save_setting(self):
         setting = {
@@ -133,9 +162,13 @@ class SettingDialog(QDialog):
             "phase_min": self.phase_min,
             "mag_max": self.mag_max,
             "mag_min": self.mag_min,
+            "render_fps": self.render_fps,
             "dir_path": self.dir_path,
+            "pipelined": self.pipelined,
+            "separate_process": self.separate_process,
+            "record_format": self.record_format,
+            "stream_address": self.stream_address,
         }
 
-        file_path = os.path.dirname(os.path.realpath(__file__))
-        with open(os.path.join(file_path, "settings.json"), "w") as f:
-            f.write(json.dumps(setting))
+        # the getters of urad.contrib see the new values at once
+        settings.save(setting)
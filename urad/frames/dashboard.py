@@ -1,21 +1,34 @@
-import os
+import importlib
 import typing
-import datetime
-import csv
+import math
+import time
 
-import numpy as np
-
-from serial.serialutil import SerialException
-
-from PyQt5.QtCore import QThread, QTime, pyqtSlot
+from PyQt5.QtCore import QThread, QTime, QTimer, pyqtSlot
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtWidgets import (
-    QGridLayout, QGroupBox, QHBoxLayout,
+    QComboBox, QGridLayout, QGroupBox, QHBoxLayout,
     QLabel, QPushButton, QTimeEdit, QVBoxLayout, QWidget
 )
 
-from urad.contrib import PlotCanvas, get_path_setting, get_port_setting, get_scale_plot
-from urad.radar import URadRadar
+from urad.contrib import (
+    get_acquisition_setting, get_path_setting, get_port_setting,
+    get_process_setting, get_record_format, get_render_fps, get_scale_plot,
+    get_stream_setting
+)
+
+if typing.TYPE_CHECKING:
+    import numpy as np
+
+    from urad.recording import Recorder
+
+# farthest distance shown by the waterfall, metres
+WATERFALL_RANGE = 10.0
+
+# windows of the history plot, seconds, None for everything
+HISTORY_WINDOWS = {"1 menit": 60.0, "10 menit": 600.0, "1 jam": 3600.0, "Semua": None}
+
+# seconds between two redraws of the history plot
+HISTORY_INTERVAL = 0.5
 
 
 class DashboardFrame(QWidget):
@@ -24,15 +37,41 @@ class DashboardFrame(QWidget):
 
         layout = QGridLayout(self)
 
-        layout.addWidget(self._side_bar(), 0, 0, 2, 1)
+        layout.addWidget(self._side_bar(), 0, 0, 4, 1)
         layout.addWidget(self._plot_phase_group(), 0, 1)
         layout.addWidget(self._plot_magnitude_group(), 1, 1)
+        layout.addWidget(self._plot_waterfall_group(), 2, 1)
+        layout.addWidget(self._plot_history_group(), 3, 1)
 
         layout.setColumnStretch(0, 5)
         layout.setColumnStretch(1, 35)
 
         self.setLayout(layout)
-        self._set_buffer()
+
+        # one recorder and read position per stream, a single radar is the
+        # stream "" with its usual file names
+        self.recorders: typing.Dict[str, "Recorder"] = {}
+        self._streams: typing.Dict[str, tuple] = {}
+        self._frames_read: typing.Dict[str, int] = {}
+        self._record_errors: typing.Set[str] = set()
+
+        # the plots pull the newest frame at a steady rate, frames that
+        # arrive in between are not drawn
+        self.render_timer = QTimer(self)
+        self.render_timer.timeout.connect(self._render)
+        self.rendered_frames = 0
+        self._rendered_count = 0
+        self._render_report = (0.0, 0, 0)
+        self._history_rendered = 0.0
+        self._ultrasonic_fed = -math.inf
+
+        # the canvases load matplotlib, they are made once the window is up
+        self.phase_plot = None
+        self.magnitude_plot = None
+        self.waterfall = None
+        self.history = None
+        QTimer.singleShot(0, self._create_plots)
+
         self.setStyleSheet(
             """
             QPushButton {
@@ -49,29 +88,73 @@ class DashboardFrame(QWidget):
             """
         )
 
-    def _set_buffer(self):
-        self.buffer_data = {
-            "i": [],
-            "q": [],
-            "phase": [],
-            "magnitude": [],
-            "ultrasonik": [],
-        }
+    @pyqtSlot(int)
+    def _record_frames(self, count: int) -> None:
+        for name, (stream, configuration) in self._streams.items():
+            records, self._frames_read[name], missed = stream.read_since(self._frames_read.get(name, 0))
+            if missed:
+                print(f"{missed} frame tidak tersimpan, penyimpanan data terlalu lambat.")
+
+            if not len(records):
+                continue
+
+            # the plots follow the first radar and the first ultrasonic sensor
+            if name in ("", "radar1"):
+                self.waterfall.extend(records["time"], records["magnitude"])
+            if name in ("", "radar1", "ultrasonic1"):
+                self._extend_history(records)
+
+            recorder = self._recorder(name, configuration, stream.dtype)
+            recorder.write_frames(records)
+
+            # reported once, the recorder drops what comes after
+            if recorder.error is not None and name not in self._record_errors:
+                self._record_errors.add(name)
+                print(f"Data tidak dapat disimpan ke {recorder.directory}, periksa folder penyimpanan.\n", recorder.error)
+
+    def _recorder(self, name: str, configuration: dict, dtype: "np.dtype") -> "Recorder":
+        # a new set of files starts with the first frame after a save
+        if name not in self.recorders:
+            from urad.recording import BinaryRecorder, CSVRecorder, session_date
+
+            date = next(iter(self.recorders.values())).date if self.recorders else session_date()
+            if get_record_format() == "binary":
+                recorder = BinaryRecorder(get_path_setting(), configuration, dtype, name=name, date=date)
+            else:
+                recorder = CSVRecorder(get_path_setting(), name=name, date=date)
+            recorder.start()
+            self.recorders[name] = recorder
+
+        return self.recorders[name]
+
+    def _extend_history(self, records: "np.ndarray") -> None:
+        from urad.sync import unique_samples
+
+        names = records.dtype.names
+        if "phase" in names:
+            self.history.extend_phase(records["time"], records["phase"])
+
+        if "ultrasonik" not in names:
+            return
 
-    def _save_data(self):
-        today = str(datetime.datetime.today()).replace(":", ".")
+        if "ultrasonik_time" not in names:
+            # a stream of the sensor, one record per reading
+            self.history.extend_ultrasonic(records["time"], records["ultrasonik"])
+            return
+
+        # every frame repeats the latest reading, keep the new ones
+        times, distance = unique_samples(records["ultrasonik_time"], records["ultrasonik"])
+        new = times > self._ultrasonic_fed
+        if new.any():
+            self.history.extend_ultrasonic(times[new], distance[new])
+            self._ultrasonic_fed = times[new][-1]
 
-        for label, datas in self.buffer_data.items():
-            path = f"{get_path_setting()}/DATA_{label.upper()}_{today}.csv"
-            with open(path, "w+", newline="") as f:
-                writer = csv.writer(f, dialect="excel")
-                for data in datas:
-                    try:
-                        writer.writerow(data.tolist())
-                    except Exception:
-                        writer.writerow([data])
+    def _save_data(self):
+        for recorder in self.recorders.values():
+            recorder.close()
 
-        self._set_buffer()
+        self.recorders = {}
+        self._record_errors = set()
 
     def _side_bar(self) -> QWidget:
         widget = QWidget()
@@ -88,12 +171,19 @@ class DashboardFrame(QWidget):
         self.timer_input = QTimeEdit()
         self.timer_input.setDisplayFormat("hh.mm.ss")
 
+        self.frame_rate_label = QLabel(widget)
+        self.vital_signs_label = QLabel(widget)
+        self.render_label = QLabel(widget)
+
         layout.addWidget(logo)
         layout.addStretch(1)
         layout.addWidget(self.start_button)
         layout.addWidget(stop_button)
         layout.addWidget(save_button)
         layout.addWidget(self.timer_input)
+        layout.addWidget(self.frame_rate_label)
+        layout.addWidget(self.vital_signs_label)
+        layout.addWidget(self.render_label)
         layout.addStretch(20)
 
         self.start_button.clicked.connect(self._start_radar)
@@ -121,17 +211,87 @@ class DashboardFrame(QWidget):
 
         self.timer_input.setTime(QTime(hours, mins, sec))
 
+    @pyqtSlot(float, float)
+    def _show_frame_rate(self, fps: float, serial_fps: float):
+        self.frame_rate_label.setText(f"FPS: {fps:.1f} (serial: {serial_fps:.1f})")
+
+    @pyqtSlot(float, float)
+    def _show_vital_signs(self, breaths: float, beats: float):
+        if math.isnan(breaths):
+            return self.vital_signs_label.setText("Napas: -\nDetak: -")
+
+        self.vital_signs_label.setText(f"Napas: {breaths:.0f} /menit\nDetak: {beats:.0f} /menit")
+
+    def _create_plots(self) -> None:
+        if self.phase_plot is not None:
+            return
+
+        from urad.plots import HistoryCanvas, PlotCanvas, WaterfallCanvas
+        from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
+
+        self.phase_plot = PlotCanvas()
+        self._phase_layout.addWidget(self.phase_plot)
+
+        self.magnitude_plot = PlotCanvas()
+        self._magnitude_layout.addWidget(self.magnitude_plot)
+
+        self.waterfall = WaterfallCanvas()
+        self._waterfall_layout.addWidget(self.waterfall)
+
+        self.history = HistoryCanvas()
+        toolbar = NavigationToolbar2QT(self.history, self)
+        self._history_controls.insertWidget(0, toolbar)
+        self._history_layout.addWidget(self.history)
+
+        def stop_following(event):
+            # a zoom or pan of the toolbar keeps its limits
+            if toolbar.mode:
+                self.history.follow = False
+                self.history.render()
+
+        self.history.mpl_connect("button_release_event", stop_following)
+
+        # then the radar modules, so Start does not wait for them
+        QTimer.singleShot(0, self._preload_radar)
+
+    def _preload_radar(self) -> None:
+        importlib.import_module("urad.radar.radar")
+
     def _start_radar(self):
+        from serial.serialutil import SerialException
+        from urad.radar import URadRadar
+
+        self._create_plots()
+
+        from urad.radar.manager import split_ports
+
         urad_port, ultrasonic_port = get_port_setting()
         timep = self.timer_input.time()
 
+        # several ports, separated by commas, are opened together
+        urad_ports, ultrasonic_ports = split_ports(urad_port), split_ports(ultrasonic_port)
+        if len(urad_ports) > 1 or len(ultrasonic_ports) > 1:
+            urad_port, ultrasonic_port = urad_ports, ultrasonic_ports
+
         timer_sec = (timep.hour() * 3600) + (timep.minute() * 60) + timep.second()
 
         try:
-            self.urad_radar = URadRadar(urad_port, ultrasonic_port, timer_sec)
+            # a raw capture goes straight to disk from the radar thread
+            raw_capture = get_path_setting() if get_record_format() == "raw" else None
+
+            self.urad_radar = URadRadar(
+                urad_port, ultrasonic_port, timer_sec,
+                pipelined=get_acquisition_setting(),
+                raw_capture=raw_capture,
+                separate_process=get_process_setting(),
+                publish=get_stream_setting() or None
+            )
         except SerialException as e:
             print("Tidak dapat menemukan radar, pastikan port telah benar.\n", e)
             return
+        except (OSError, ValueError) as e:
+            print("Tidak dapat membuka alamat stream, periksa pengaturan stream.\n", e)
+            return
 
         self.radar_thread = QThread()
 
@@ -140,25 +300,35 @@ class DashboardFrame(QWidget):
         self.urad_radar.finished.connect(self.radar_thread.quit)
         #  self.urad_radar.finished.connect(self.urad_radar.deleteLater)
         self.radar_thread.finished.connect(self.radar_thread.deleteLater)
-
-        # connect signal for radar ploting
-        self.urad_radar.phase_plot.connect(self._plot_phase)
-        self.urad_radar.magnitude_plot.connect(self._plot_magnitude)
+        self.radar_thread.finished.connect(self._stop_render)
 
         # connect signal for radar data
-        self.urad_radar.ultrasonic_data.connect(self.buffer_data["ultrasonik"].append)
-        self.urad_radar.i_data.connect(self.buffer_data["i"].append)
-        self.urad_radar.q_data.connect(self.buffer_data["q"].append)
-        self.urad_radar.peek_phase.connect(self.buffer_data["phase"].append)
-        self.urad_radar.magnitude_data.connect(self.buffer_data["magnitude"].append)
+        self._streams = self.urad_radar.streams()
+        self._frames_read = {}
+        self.urad_radar.frames_ready.connect(self._record_frames)
 
         # connect signal for gui
         self.urad_radar.time.connect(self._set_timer_countdown)
+        self.urad_radar.frame_rate.connect(self._show_frame_rate)
+        self.urad_radar.vital_signs.connect(self._show_vital_signs)
         self.urad_radar.finished.connect(self._stop_radar)
 
         self.radar_thread.start()
         self.start_button.setEnabled(False)
 
+        if self.urad_radar.frame_block is not None:
+            dsp = self.urad_radar.dsp
+            bins = min(dsp.n_fft // 2, math.ceil(WATERFALL_RANGE * dsp.bins_per_metre))
+            self.waterfall.configure(bins, 1 / dsp.bins_per_metre)
+
+        self.history.clear()
+        self._ultrasonic_fed = -math.inf
+
+        self.rendered_frames = 0
+        self._rendered_count = 0
+        self._render_report = (time.perf_counter(), 0, 0)
+        self.render_timer.start(int(1000 / get_render_fps()))
+
     @pyqtSlot()
     def _stop_radar(self):
         try:
@@ -168,53 +338,111 @@ class DashboardFrame(QWidget):
 
         self.start_button.setEnabled(True)
 
+    @pyqtSlot()
+    def _stop_render(self):
+        # draw the last frames of the radar before stopping
+        self._render()
+        self.render_timer.stop()
+
+    def _render(self) -> None:
+        frame_block = self.urad_radar.frame_block
+        if frame_block is None:
+            return
+
+        record, count = frame_block.latest()
+        if record is None or count == self._rendered_count:
+            return
+
+        self._rendered_count = count
+        self.rendered_frames += 1
+
+        self._plot_phase(self.urad_radar.peak_phase_series.latest(self.urad_radar.phase_history))
+        self._plot_magnitude(record["magnitude"])
+        self._plot_waterfall()
+
+        now = time.perf_counter()
+        if now - self._history_rendered >= HISTORY_INTERVAL:
+            self._history_rendered = now
+            self.history.render()
+
+        last_report, rendered, acquired = self._render_report
+        if now - last_report >= 1:
+            self._render_report = (now, self.rendered_frames, count)
+            rendered = self.rendered_frames - rendered
+            self.render_label.setText(
+                f"Plot: {rendered / (now - last_report):.1f} fps ({rendered} dari {count - acquired} frame)"
+            )
+
     def _plot_phase_group(self) -> QWidget:
         widget = QGroupBox()
         layout = QHBoxLayout()
 
-        self.phase_plot = PlotCanvas()
-
-        layout.addWidget(self.phase_plot)
+        self._phase_layout = layout
 
         widget.setTitle("Phase")
         widget.setLayout(layout)
         return widget
 
-    @pyqtSlot(np.ndarray)
-    def _plot_phase(self, phase_data: np.ndarray) -> None:
-        #  refresh and plot the data
-        self.phase_plot.axes.clear()
-
+    def _plot_phase(self, phase_data: "np.ndarray") -> None:
         phase_max, phase_min, _, _ = get_scale_plot()
 
-        self.phase_plot.axes.plot(phase_data)
-        self.phase_plot.axes.set_ylim([phase_min, phase_max])
+        self.phase_plot.set_ylim(phase_min, phase_max)
+        self.phase_plot.plot(phase_data)
 
-        # refresh canvas
-        self.phase_plot.draw_idle()
-        self.phase_plot.flush_events()
+    def _plot_magnitude(self, magnitude_data: "np.ndarray") -> None:
+        _, _, mag_max, mag_min = get_scale_plot()
 
-    @pyqtSlot(np.ndarray)
-    def _plot_magnitude(self, magnitude_data: np.ndarray) -> None:
-        self.magnitude_plot.axes.clear()
+        self.magnitude_plot.set_ylim(mag_min, mag_max)
+        self.magnitude_plot.plot(magnitude_data)
 
-        _, _, mag_max, mag_min = get_scale_plot()
+    def _plot_magnitude_group(self) -> QWidget:
+        widget = QGroupBox()
+        layout = QHBoxLayout()
 
-        self.magnitude_plot.axes.plot(magnitude_data)
-        self.magnitude_plot.axes.set_ylim([mag_min, mag_max])
+        self._magnitude_layout = layout
 
-        # refresh canvas
-        self.magnitude_plot.draw_idle()
-        self.magnitude_plot.flush_events()
+        widget.setTitle("Magnitude")
+        widget.setLayout(layout)
+        return widget
 
-    def _plot_magnitude_group(self) -> QWidget:
+    def _plot_waterfall_group(self) -> QWidget:
         widget = QGroupBox()
         layout = QHBoxLayout()
 
-        self.magnitude_plot = PlotCanvas()
+        self._waterfall_layout = layout
 
-        layout.addWidget(self.magnitude_plot)
+        widget.setTitle("Waterfall")
+        widget.setLayout(layout)
+        return widget
 
-        widget.setTitle("Magnitude")
+    def _plot_waterfall(self) -> None:
+        _, _, mag_max, mag_min = get_scale_plot()
+
+        self.waterfall.set_clim(mag_min, mag_max)
+        self.waterfall.render()
+
+    def _plot_history_group(self) -> QWidget:
+        widget = QGroupBox()
+        layout = QVBoxLayout()
+
+        window = QComboBox(widget)
+        window.addItems(HISTORY_WINDOWS)
+        window.setCurrentText("10 menit")
+
+        def follow_window(text: str):
+            self.history.span = HISTORY_WINDOWS[text]
+            self.history.follow = True
+            self.history.render()
+
+        window.currentTextChanged.connect(follow_window)
+
+        controls = QHBoxLayout()
+        controls.addWidget(window)
+
+        layout.addLayout(controls)
+        self._history_controls = controls
+        self._history_layout = layout
+
+        widget.setTitle("Riwayat")
         widget.setLayout(layout)
         return widget
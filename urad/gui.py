@@ -6,7 +6,6 @@ from PyQt5.QtWidgets import (
     QDesktopWidget, QMainWindow, QMenuBar, QWidget
 )
 
-from urad.dialogs import SettingDialog
 from urad.frames import DashboardFrame
 
 
@@ -30,6 +29,8 @@ class MainWindow(QMainWindow):
         self.move(qr.topLeft())
 
     def _open_setting(self):
+        from urad.dialogs import SettingDialog
+
         SettingDialog(self).exec()
 
     def _create_menubar(self):
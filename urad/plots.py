@@ -0,0 +1,223 @@
+"""
+Matplotlib canvases of the dashboard.
+
+Importing this module loads matplotlib, the dashboard only does so once
+its window is on screen.
+"""
+import typing
+
+import numpy as np
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+
+from urad.buffers import MinMaxPyramid, RingBuffer
+
+
+class BlitCanvas(FigureCanvas):
+    """
+    Canvas whose artists are made once, an update only redraws ``artist``
+    over a copy of the axes background taken on the last full draw
+    """
+    def __init__(self) -> None:
+        self.figure = Figure(tight_layout=True)
+        self.figure.subplots_adjust(hspace=0)
+
+        self.axes = self.figure.add_subplot(111)
+        super().__init__(self.figure)
+
+        self.artist = None
+        self._background = None
+
+        self.mpl_connect("draw_event", self._cache_background)
+
+    def _cache_background(self, event) -> None:
+        self._background = self.copy_from_bbox(self.axes.bbox)
+        if self.artist is not None:
+            self.axes.draw_artist(self.artist)
+
+    def invalidate(self) -> None:
+        """
+        The next update redraws everything, for changes of axes and limits
+        """
+        self._background = None
+
+    def set_ylim(self, bottom: float, top: float) -> None:
+        if tuple(self.axes.get_ylim()) != (bottom, top):
+            self.axes.set_ylim(bottom, top)
+            self.invalidate()
+
+    def blit_artist(self) -> None:
+        if self._background is None:
+            # full redraw, the draw event caches the new background
+            self.draw_idle()
+            return
+
+        self.restore_region(self._background)
+        self.axes.draw_artist(self.artist)
+        self.blit(self.axes.bbox)
+
+
+class PlotCanvas(BlitCanvas):
+    """
+    Canvas holding one line. Only a change of limits or length redraws
+    more than the line.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+
+        (self.line,) = self.axes.plot([], [], animated=True)
+        self.artist = self.line
+        self._x = np.arange(0)
+
+    def plot(self, data: np.ndarray) -> None:
+        if len(data) != len(self._x):
+            self._x = np.arange(len(data))
+            self.axes.set_xlim(0, max(1, len(data) - 1))
+            self.invalidate()
+
+        self.line.set_data(self._x, data)
+        self.blit_artist()
+
+
+class WaterfallCanvas(BlitCanvas):
+    """
+    Range-time image of the magnitude spectrum, newest frame on the right.
+
+    Every frame is one column of a preallocated circular image holding
+    ``seconds`` of history at up to ``max_frame_rate``. A redraw shows at
+    most ``columns`` of them, so its cost does not grow with the history.
+    """
+    def __init__(self, seconds: float = 120.0, max_frame_rate: float = 150.0, columns: int = 800) -> None:
+        super().__init__()
+
+        self.seconds = seconds
+        self.max_frame_rate = max_frame_rate
+        self.columns = columns
+
+        self.image = self.axes.imshow(
+            np.full((1, 1), np.nan), aspect="auto", origin="lower",
+            interpolation="nearest", animated=True
+        )
+        self.artist = self.image
+        self.axes.set_xlim(-seconds, 0)
+        self.axes.set_xlabel("Waktu (detik)")
+        self.axes.set_ylabel("Jarak (m)")
+
+        self.configure(1, 1.0)
+
+    def configure(self, bins: int, metres_per_bin: float) -> None:
+        """
+        Clear the history, for spectra whose first ``bins`` bins are shown
+        """
+        self.bins = bins
+        self.metres_per_bin = metres_per_bin
+
+        capacity = max(1, int(self.seconds * self.max_frame_rate))
+        self.frames = RingBuffer(capacity, np.float32, fill=np.nan, shape=(bins,))
+        self.times = RingBuffer(capacity, fill=np.nan)
+
+        self.axes.set_ylim(0, bins * metres_per_bin)
+        self.invalidate()
+
+    def extend(self, times: np.ndarray, magnitude: np.ndarray) -> None:
+        self.times.extend(times)
+        self.frames.extend(magnitude[:, :self.bins])
+
+    def set_clim(self, vmin: float, vmax: float) -> None:
+        self.image.set_clim(vmin, vmax)
+
+    def render(self) -> None:
+        n = len(self.frames)
+        if not n:
+            return
+
+        # every step-th frame, always including the newest one
+        step = -(-n // self.columns)
+        frames = self.frames.latest(n)[::-step][::-1]
+        times = self.times.latest(n)
+
+        self.image.set_data(frames.T)
+        self.image.set_extent((times[0] - times[-1], 0, 0, self.bins * self.metres_per_bin))
+        self.blit_artist()
+
+
+class HistoryCanvas(FigureCanvas):
+    """
+    Long history of peak phase and ultrasonic distance, from minutes to
+    hours. Each stream sits on a ``MinMaxPyramid`` and a redraw asks it for
+    about one point per pixel of the shown window, drawn as the min/max
+    envelope, so the cost does not depend on how many samples it spans.
+
+    While ``follow`` is set the window ends at the newest sample and spans
+    ``span`` seconds, or the whole history when it is None; otherwise the
+    current limits of the axes, e.g. after a zoom, are shown.
+    """
+    def __init__(self, span: typing.Optional[float] = 600.0) -> None:
+        # laid out once, tight_layout on every redraw costs more than the lines
+        self.figure = Figure()
+        self.figure.subplots_adjust(left=0.08, right=0.98, top=0.97, bottom=0.12, hspace=0.1)
+
+        self.phase_axes = self.figure.add_subplot(211)
+        self.ultrasonic_axes = self.figure.add_subplot(212, sharex=self.phase_axes)
+        super().__init__(self.figure)
+
+        self.phase_axes.set_ylabel("Phase (rad)")
+        self.ultrasonic_axes.set_ylabel("Ultrasonik")
+        self.ultrasonic_axes.set_xlabel("Waktu (detik)")
+
+        (self.phase_line,) = self.phase_axes.plot([], [], linewidth=0.8)
+        (self.ultrasonic_line,) = self.ultrasonic_axes.plot([], [], linewidth=0.8)
+
+        self.span = span
+        self.follow = True
+        self.clear()
+
+    def clear(self) -> None:
+        self.phase = MinMaxPyramid()
+        self.ultrasonic = MinMaxPyramid()
+        self.origin: typing.Optional[float] = None
+        self.newest: typing.Optional[float] = None
+
+    def extend_phase(self, times: np.ndarray, phase: np.ndarray) -> None:
+        self._seen(times)
+        self.phase.extend(times, phase)
+
+    def extend_ultrasonic(self, times: np.ndarray, distance: np.ndarray) -> None:
+        self._seen(times)
+        self.ultrasonic.extend(times, distance)
+
+    def _seen(self, times: np.ndarray) -> None:
+        if not len(times):
+            return
+        if self.origin is None:
+            self.origin = float(times[0])
+        self.newest = max(self.newest or -np.inf, float(times[-1]))
+
+    def _plot(self, pyramid: MinMaxPyramid, line, axes, start: float, end: float) -> None:
+        times, low, high = pyramid.window(start, end, max(1, int(axes.bbox.width)))
+        line.set_data(np.repeat(times - self.origin, 2), np.column_stack([low, high]).ravel())
+
+        if len(times) and not np.isnan(low).all():
+            bottom, top = np.nanmin(low), np.nanmax(high)
+            margin = 0.05 * (top - bottom) or 0.5
+            axes.set_ylim(bottom - margin, top + margin)
+
+    def render(self) -> None:
+        if self.origin is None:
+            return
+
+        if self.follow:
+            end = self.newest - self.origin
+            start = 0.0 if self.span is None else end - self.span
+            self.phase_axes.set_xlim(start, max(end, start + 1))
+        else:
+            start, end = self.phase_axes.get_xlim()
+
+        for pyramid, line, axes in (
+            (self.phase, self.phase_line, self.phase_axes),
+            (self.ultrasonic, self.ultrasonic_line, self.ultrasonic_axes),
+        ):
+            self._plot(pyramid, line, axes, start + self.origin, end + self.origin)
+
+        self.draw_idle()
@@ -1 +1,18 @@
-from .radar import URadRadar
+import importlib
+
+# imported on first use, the device and the DSP code do not need Qt
+_EXPORTS = {
+    "URadRadar": "urad.radar.radar",
+    "URadDevice": "urad.radar.device",
+    "RadarProcess": "urad.radar.process",
+    "DeviceManager": "urad.radar.manager",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,471 @@
+"""
+Acquisition loop of the uRAD radar without Qt.
+
+``RadarAcquisition`` configures the radar from a ``RadarProfile``, runs the
+detection, DSP and vital signs loop and writes every frame to a
+``RecordRing``; it reports through plain callbacks, called from the thread
+that runs ``run``. ``URadRadar`` wraps it for the GUI, ``urad.capture``
+drives it from the command line.
+"""
+import math
+import queue
+import typing
+import time
+
+import numpy as np
+
+from urad.buffers import RecordRing, SharedRecordRing, TimeSeriesBuffer
+from urad.radar.device import URadDevice
+from urad.radar.dsp import DSPPlan, Spectrum
+from urad.radar.pipeline import FrameRateMeter, FrameReader
+from urad.radar.ultrasonic import UltrasonicSensor
+from urad.radar.vitals import VitalSignEstimator
+from urad.recording import RawRecorder, frame_dtype
+from urad.sync import align, now
+
+if typing.TYPE_CHECKING:
+    from urad.stream import FramePublisher
+
+
+class RadarProfile(typing.NamedTuple):
+    """
+    Arguments of ``URadDevice.configure``
+    """
+    mode: int = 2					# sawtooth mode
+    f0: int = 5						# starting at 24.005 GHz
+    BW: int = 240					# using all the BW available = 240 MHz
+    Ns: int = 200					# 200 samples
+    Ntar: int = 3					# 3 target of interest
+    Rmax: int = 100					# searching along the full distance range
+    MTI: int = 0					# MTI mode disable because we want information of static and moving targets
+    Mth: int = 0					# parameter not used because "movement" is not requested
+    Alpha: int = 10					# signal has to be 10 dB higher than its surrounding
+    distance_true: bool = True 		# request distance information
+    velocity_true: bool = False		# mode 2 does not provide velocity information
+    SNR_true: bool = True 			# Signal-to-Noise-Ratio information requested
+    I_true: bool = True 			# In-Phase Component (RAW data) requested
+    Q_true: bool = True				# Quadrature Component (RAW data) requested
+    movement_true: bool = False 	# not interested in boolean movement detection
+
+
+PROFILES = {
+    # what the application has always used: static and moving targets
+    # up to the full range, for the phase of a chest
+    "default": RadarProfile(),
+    # half the samples per ramp, about twice the frame rate
+    "fast": RadarProfile(Ns=100),
+    # triangular ramps, also reports the velocity of the targets
+    "triangle": RadarProfile(mode=3, velocity_true=True),
+}
+
+# relative change of the frame rate that puts the vital signs on a new grid
+VITALS_RATE_DRIFT = 0.2
+
+
+class RadarAcquisition:
+    """
+    The radar, the optional ultrasonic sensor and the per-frame processing.
+
+    Frames are published in ``frame_block``; ``on_frames`` gets the frame
+    count at most ``notify_rate`` times a second. Once a second
+    ``on_frame_rate`` gets the achieved and the serial frame rate,
+    ``on_vital_signs`` the breaths and beats per minute and, for a capture
+    of ``duration`` seconds, ``on_time`` the seconds left. ``on_finished``
+    is called when the radar has been closed. With ``publish``, the same
+    batches are served to other programs by a ``urad.stream.FramePublisher``.
+    """
+    def __init__(self,
+                 urad_port: str,
+                 ultrasonic_port: str = "",
+                 duration: float = 0,
+                 profile: RadarProfile = PROFILES["default"],
+                 using_usb: bool = True,
+                 pipelined: bool = False,
+                 n_fft: typing.Optional[int] = None,
+                 multi_target: bool = True,
+                 phase_history: int = 99,
+                 stream_history: int = 4096,
+                 raw_capture: typing.Optional[str] = None,
+                 frame_block: int = 1024,
+                 shared_frames: bool = False,
+                 publish: typing.Optional[str] = None,
+                 name: str = "",
+                 notify_rate: float = 30.0,
+                 on_frames: typing.Optional[typing.Callable[[int], None]] = None,
+                 on_frame_rate: typing.Optional[typing.Callable[[float, float], None]] = None,
+                 on_vital_signs: typing.Optional[typing.Callable[[float, float], None]] = None,
+                 on_time: typing.Optional[typing.Callable[[int], None]] = None,
+                 on_finished: typing.Optional[typing.Callable[[], None]] = None
+                 ) -> None:
+        self.timeSleep = 5e-3       # Sleep Time (seconds) between iterations
+        self.is_taking_data = True
+
+        self.on_frames = on_frames
+        self.on_frame_rate = on_frame_rate
+        self.on_vital_signs = on_vital_signs
+        self.on_time = on_time
+        self.on_finished = on_finished
+
+        # seconds to capture for, 0 until stopped
+        self.duration = duration
+        self.deadline: typing.Optional[float] = None
+
+        self.profile = profile
+
+        # the radar among several, in the stream and file names
+        self.name = name
+
+        # True if USB, False if UART
+        self.usb_communication = using_usb
+
+        # request the next frame on a reader thread while this one is processed
+        self.pipelined = pipelined
+        self.reader: typing.Optional[FrameReader] = None
+        self.meter = FrameRateMeter()
+
+        # one record per frame with the phase of every target, instead of
+        # one copy of the frame per detected target
+        self.multi_target = multi_target
+
+        # samples of peak phase shown by the phase plot
+        self.phase_history = phase_history
+
+        # peak phase of the last frames with their receive time, for the
+        # phase plot and for aligning with the ultrasonic readings
+        self.peak_phase_series = TimeSeriesBuffer(max(stream_history, phase_history))
+
+        # directory to store the packed frames in, without any processing
+        self.raw_capture = raw_capture
+        self.raw_recorder: typing.Optional[RawRecorder] = None
+
+        # frames for the consumer, which is told about them in batches
+        self.frame_block: typing.Optional[RecordRing] = None
+        self.notify_interval = 1 / notify_rate
+        self._last_notify = 0.0
+        self._notified = 0
+
+        # serves the frames to other programs, on host:port or a Unix socket
+        self.publisher: typing.Optional["FramePublisher"] = None
+        self._published = 0
+
+        if publish and not raw_capture:
+            from urad.stream import _socket_address
+
+            # a bad address fails here, before the radar is switched on
+            _socket_address(publish)
+
+        self.ultrasonic: typing.Optional[UltrasonicSensor] = None
+
+        # built once the frame rate, its sample rate, is known
+        self.vitals: typing.Optional[VitalSignEstimator] = None
+
+        self.device = URadDevice(urad_port, self.usb_communication, bulk_read=True)
+
+        try:
+            self.device.open()
+        except Exception:
+            return self.close()
+
+        # switch ON uRAD
+        return_code = self.device.turn_on()
+        if return_code != 0:
+            return self.close()
+
+        if not self.usb_communication:
+            time.sleep(self.timeSleep)
+
+        # loadConfiguration uRAD
+        return_code = self.device.configure(*profile)
+
+        if return_code != 0:
+            return self.close()
+
+        # window and scaling only depend on the configuration
+        self.dsp = DSPPlan.from_layout(self.device.layout, n_fft)
+
+        if not self.usb_communication:
+            time.sleep(self.timeSleep)
+
+        # Setup radar perhiperal
+        if ultrasonic_port:
+            self.ultrasonic = UltrasonicSensor(ultrasonic_port, stream_history)
+
+        # in shared memory for a consumer in another process
+        configuration = self.recording_configuration()
+        ring = SharedRecordRing if shared_frames else RecordRing
+        self.frame_block = ring(frame_block, frame_dtype(
+            configuration["Ns_total"], configuration["n_fft"],
+            configuration["Ntar"], configuration["ultrasonic"]
+        ))
+
+        if publish and not raw_capture:
+            from urad.stream import FramePublisher
+
+            try:
+                self.publisher = FramePublisher(publish, self.frame_block.dtype, configuration)
+            except OSError:
+                self.close()
+                raise
+            self.publisher.start()
+
+    def close(self) -> None:
+        if self.reader is not None:
+            self.reader.stop()
+
+        # switch OFF uRAD
+        self.device.turn_off()
+
+        try:
+            self.device.close()
+            self.ultrasonic.stop()
+        except Exception:
+            pass
+
+        if self.raw_recorder is not None:
+            self.raw_recorder.close()
+
+        self._notify_frames(force=True)
+
+        if self.publisher is not None:
+            self.publisher.close()
+
+        if self.on_finished is not None:
+            self.on_finished()
+
+    def recording_configuration(self) -> dict:
+        """
+        Radar configuration stored in the header of a binary recording
+        """
+        layout = self.device.layout
+        return {
+            "mode": layout.mode,
+            "f0": layout.f0,
+            "BW": layout.BW,
+            "Ns": layout.Ns,
+            "Ntar": layout.Ntar,
+            "Ns_total": self.dsp.Ns,
+            "n_fft": self.dsp.n_fft,
+            "ultrasonic": self.ultrasonic is not None,
+        }
+
+    def streams(self) -> typing.Dict[str, typing.Tuple[RecordRing, dict]]:
+        """
+        The frames by stream name, with the configuration to record them with
+        """
+        if self.frame_block is None:
+            return {}
+        return {self.name: (self.frame_block, self.recording_configuration())}
+
+    def aligned_ultrasonic(self,
+                           frame_times: typing.Optional[np.ndarray] = None,
+                           method: str = "nearest",
+                           tolerance: typing.Optional[float] = None
+                           ) -> np.ndarray:
+        """
+        Ultrasonic readings at the receive time of the frames kept in
+        ``peak_phase_series``, or at ``frame_times``
+        """
+        if frame_times is None:
+            frame_times, _ = self.peak_phase_series.snapshot()
+
+        if self.ultrasonic is None:
+            return align(frame_times, [], [])
+
+        return self.ultrasonic.history.at(frame_times, method, tolerance)
+
+    def _next_frame(self) -> typing.Optional[tuple]:
+        if self.reader is None:
+            start = time.perf_counter()
+            frame = self.device.detection()
+            received = now()
+            self.meter.add_read(time.perf_counter() - start)
+            return (*frame, received)
+
+        while self.is_taking_data:
+            try:
+                return self.reader.frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+        return None
+
+    def _write_frame(self,
+                     spectrum: Spectrum,
+                     received: float,
+                     target_phase: np.ndarray
+                     ) -> None:
+        self.peak_phase_series.append(received, spectrum.peak_phase)
+
+        record = self.frame_block.next_record()
+        record["time"] = received
+        record["i"] = spectrum.data_i
+        record["q"] = spectrum.data_q
+        record["magnitude"] = spectrum.magnitude
+        record["phase"] = spectrum.peak_phase
+        record["target_phase"] = target_phase
+
+        if self.ultrasonic is not None:
+            record["ultrasonik_time"], record["ultrasonik"] = self.ultrasonic.read_stamped()
+
+        self.frame_block.commit()
+
+    def _notify_frames(self, force: bool = False) -> None:
+        if self.frame_block is None or self.frame_block.count == self._notified:
+            return
+
+        current = time.perf_counter()
+        if force or current - self._last_notify >= self.notify_interval:
+            self._last_notify = current
+            self._notified = self.frame_block.count
+
+            if self.publisher is not None:
+                records, self._published, _ = self.frame_block.read_since(self._published)
+                self.publisher.publish(records, self._published - len(records))
+
+            if self.on_frames is not None:
+                self.on_frames(self._notified)
+
+    def _time_is_up(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def _report(self) -> None:
+        """
+        Once a second: frame rate, time left and, once known, vital signs
+        """
+        if self.on_frame_rate is not None:
+            self.on_frame_rate(self.meter.fps, self.meter.serial_fps)
+
+        if self.deadline is not None and self.on_time is not None:
+            self.on_time(max(0, math.ceil(self.deadline - time.monotonic())))
+
+        if self.raw_recorder is not None:
+            return
+
+        # the phase is resampled by its time stamps, rebuilt on a new grid
+        # only when the frame rate has moved far from it
+        fps = self.meter.fps
+        if self.vitals is None:
+            drift = math.inf
+        else:
+            drift = abs(fps - self.vitals.sample_rate) / self.vitals.sample_rate
+
+        if fps and drift > VITALS_RATE_DRIFT:
+            self.vitals = VitalSignEstimator(fps)
+        elif self.vitals is not None and self.on_vital_signs is not None:
+            self.on_vital_signs(*self.vitals.rates())
+
+    def _start(self) -> None:
+        if self.duration:
+            self.deadline = time.monotonic() + self.duration
+
+    def _run_raw_capture(self):
+        layout = self.device.layout
+        self.raw_recorder = RawRecorder(self.raw_capture, self.device.configuration, layout.frame_bytes, self.name)
+        last_report = time.perf_counter()
+
+        self._start()
+        while self.is_taking_data:
+            if self._time_is_up():
+                break
+
+            start = time.perf_counter()
+            return_code, frame = self.device.read_raw()
+            if return_code != 0:
+                break
+
+            self.raw_recorder.append(now(), frame)
+
+            self.meter.add_read(time.perf_counter() - start)
+            self.meter.tick()
+
+            if start - last_report >= 1:
+                last_report = start
+                self._report()
+
+            if not self.usb_communication:
+                time.sleep(self.timeSleep)
+
+        return self.close()
+
+    def run(self):
+        # the port did not open or the radar did not take its configuration
+        if self.frame_block is None:
+            return self.close()
+
+        if self.raw_capture:
+            return self._run_raw_capture()
+
+        last_report = time.perf_counter()
+
+        if self.pipelined:
+            time_sleep = 0 if self.usb_communication else self.timeSleep
+            self.reader = FrameReader(self.device, self.meter, time_sleep=time_sleep)
+            self.reader.start()
+
+        self._start()
+        while self.is_taking_data:
+            if self._time_is_up():
+                break
+
+            # target detection request
+            frame = self._next_frame()
+            if frame is None:
+                break
+
+            return_code, results, raw_results, received = frame
+            if return_code != 0:
+                return self.close()
+
+            start = time.perf_counter()
+
+            # Extract results from outputs
+            NtarDetected = results[0]
+            distance = results[1]
+            SNR = results[3]
+            I = raw_results[0]
+            Q = raw_results[1]
+            
+            # One FFT per frame, every target used to redo the same work
+            if NtarDetected > 0:
+                spectrum = self.dsp.process(I, Q)
+
+            if NtarDetected > 0 and self.vitals is not None:
+                self.vitals.update(spectrum.peak_phase, received)
+
+            Ntar = self.device.layout.Ntar
+            if NtarDetected > 0 and self.multi_target:
+                target_phase = self.dsp.target_phases(spectrum.spectrum, distance[:Ntar], SNR[:Ntar])
+                self._write_frame(spectrum, received, target_phase)
+
+            elif NtarDetected > 0:
+                # Iterate through desired targets
+                for i in range(NtarDetected):
+                    # If SNR is not big enough
+                    if (SNR[i] < 0):
+                        break
+
+                    self._write_frame(spectrum, received, np.full(Ntar, np.nan))
+
+            self._notify_frames()
+
+            #  time.sleep(0.3)
+
+            self.meter.add_process(time.perf_counter() - start)
+            self.meter.tick()
+
+            if start - last_report >= 1:
+                last_report = start
+                self._report()
+
+            if self.pipelined:
+                continue
+
+            #  # If number of detected targets is greater than 0 prints an empty line for a smarter output
+            if NtarDetected > 0:
+                continue
+
+            # Sleep during specified time
+            if not self.usb_communication:
+                time.sleep(self.timeSleep)
+
+        return self.close()
@@ -0,0 +1,276 @@
+import typing
+
+import numpy as np
+import serial
+
+from urad import uRAD_USB_SDK11
+
+
+class FrameLayout(typing.NamedTuple):
+    """
+    Everything the detection loop needs to know about one frame,
+    decoded once from the configuration register
+    """
+    mode: int
+    f0: int
+    BW: int
+    Ns: int
+    Ntar: int
+    get_distance: bool
+    get_velocity: bool
+    get_SNR: bool
+    get_I: bool
+    get_Q: bool
+    get_movement: bool
+    blocks: typing.Tuple[int, ...]
+    results_bytes: int
+    iq_bytes: int
+
+    @property
+    def frame_bytes(self) -> int:
+        """
+        Size of the whole answer to one detection request
+        """
+        return self.results_bytes + self.iq_bytes * (self.get_I + self.get_Q)
+
+    @classmethod
+    def from_configuration(cls, configuration: typing.Sequence[int]) -> "FrameLayout":
+        mode = (configuration[0] & 0b11100000) >> 5
+        f0 = ((configuration[0] & 0b00011111) << 3) + ((configuration[1] & 0b11100000) >> 5)
+        BW = ((configuration[1] & 0b00011111) << 3) + ((configuration[2] & 0b11100000) >> 5)
+        Ns = ((configuration[2] & 0b00011111) << 3) + ((configuration[3] & 0b11100000) >> 5)
+        Ntar = (configuration[3] & 0b00011100) >> 2
+
+        get_distance = bool(configuration[6] & 0b10000000)
+        get_velocity = bool(configuration[6] & 0b01000000)
+        get_SNR = bool(configuration[6] & 0b00100000)
+        get_I = bool(configuration[6] & 0b00010000)
+        get_Q = bool(configuration[6] & 0b00001000)
+        get_movement = bool(configuration[6] & 0b00000100)
+
+        blocks = tuple(uRAD_USB_SDK11.iqBlocks(mode, Ns))
+
+        results_bytes = 0
+        if get_distance or get_velocity or get_SNR or get_movement:
+            results_bytes = uRAD_USB_SDK11.results_packetLen
+
+        iq_bytes = uRAD_USB_SDK11.iqBytes(blocks) if get_I or get_Q else 0
+
+        return cls(
+            mode, f0, BW, Ns, Ntar,
+            get_distance, get_velocity, get_SNR, get_I, get_Q, get_movement,
+            blocks, results_bytes, iq_bytes
+        )
+
+
+class URadDevice:
+    """
+    One uRAD USB radar and the serial port it is attached to.
+
+    Unlike the module level functions of ``uRAD_USB_SDK11`` every device keeps
+    its own configuration, so several radars can be driven from one process.
+    The frame layout is computed once in ``configure`` and ``detection`` only
+    does the serial I/O and the decoding.
+
+    With ``bulk_read`` the whole frame is read with a single call into a
+    buffer allocated at configure time, and I and Q are decoded from it
+    into arrays that are reused, so they are overwritten by the next call
+    to ``detection``.
+
+    A port named ``emulator`` talks to ``urad.radar.emulator`` instead of
+    real hardware.
+    """
+    def __init__(self, port: str, using_usb: bool = True, bulk_read: bool = False) -> None:
+        if port == "emulator":
+            from urad.radar.emulator import EmulatedSerial
+            self.ser = EmulatedSerial()
+        else:
+            self.ser = serial.Serial()
+
+        if using_usb:
+            self.ser.baudrate = int(1e6)
+        else:
+            self.ser.baudrate = 115200
+
+        self.ser.port = port
+        self.ser.bytesize = serial.EIGHTBITS
+        self.ser.parity = serial.PARITY_NONE
+        self.ser.stopbits = serial.STOPBITS_ONE
+
+        self.configuration: typing.List[int] = []
+        self.layout: typing.Optional[FrameLayout] = None
+
+        self.bulk_read = bulk_read
+        self.frame = memoryview(bytearray())
+
+    def open(self) -> None:
+        self.ser.open()
+
+    def close(self) -> None:
+        self.ser.close()
+
+    def turn_on(self) -> int:
+        return uRAD_USB_SDK11.turnON(self.ser)
+
+    def turn_off(self) -> int:
+        return uRAD_USB_SDK11.turnOFF(self.ser)
+
+    def configure(self,
+                  mode: int, f0: int, BW: int,
+                  Ns: int, Ntar: int, Rmax: int, MTI: int, Mth: int, Alpha: int,
+                  distance_true: bool, velocity_true: bool, SNR_true: bool,
+                  I_true: bool, Q_true: bool, movement_true: bool
+                  ) -> int:
+        configuration = uRAD_USB_SDK11.buildConfiguration(
+            mode, f0, BW,
+            Ns, Ntar, Rmax, MTI, Mth, Alpha,
+            distance_true, velocity_true, SNR_true,
+            I_true, Q_true, movement_true
+        )
+
+        try:
+            if not self.ser.is_open:
+                return -2
+
+            self.ser.write(bytearray([14]))
+            self.ser.write(bytearray(configuration))
+            ack = self.ser.read(1)
+        except Exception:
+            return -3
+
+        if not ack or ack[0] != 0xAA:
+            return -1
+
+        configuration[5] = configuration[5] & 0b11111110
+        self.configuration = configuration
+        self.layout = FrameLayout.from_configuration(configuration)
+
+        if self.bulk_read:
+            self._allocate_frame()
+
+        return 0
+
+    def _allocate_frame(self) -> None:
+        layout = self.layout
+        Ns_total = sum(layout.blocks)
+
+        self.frame = memoryview(bytearray(layout.frame_bytes))
+        self._I = np.empty(Ns_total, dtype=np.uint16) if layout.get_I else []
+        self._Q = np.empty(Ns_total, dtype=np.uint16) if layout.get_Q else []
+
+    def _empty_results(self) -> list:
+        results = [0, [], [], [], False]
+        if self.layout.get_distance or self.layout.get_velocity or self.layout.get_SNR:
+            results[1:4] = [[0] * uRAD_USB_SDK11.NtarMax for _ in range(3)]
+
+        return results
+
+    def _read_frame(self) -> bool:
+        """
+        Fill the frame buffer, a read returning short means a timeout
+        """
+        received = 0
+        while received < len(self.frame):
+            n = self.ser.readinto(self.frame[received:])
+            if not n:
+                return False
+            received += n
+
+        return True
+
+    def detection(self) -> typing.Tuple[int, list, list]:
+        """
+        Request one frame, same return values as ``uRAD_USB_SDK11.detection``
+        """
+        layout = self.layout
+        if layout is None:
+            return -1, [], []
+
+        results = self._empty_results()
+        I = []
+        Q = []
+
+        try:
+            if not self.ser.is_open:
+                return -1, [], []
+
+            self.ser.write(bytearray([15]))
+
+            if self.bulk_read:
+                return self._detection_bulk()
+
+            if layout.results_bytes:
+                buffer = self.ser.read(layout.results_bytes)
+                if len(buffer) != layout.results_bytes:
+                    return -2, [], []
+
+                results = uRAD_USB_SDK11.decodeResults(
+                    buffer, layout.Ntar,
+                    layout.get_distance, layout.get_velocity,
+                    layout.get_SNR, layout.get_movement
+                )
+
+            if layout.get_I:
+                buffer = self.ser.read(layout.iq_bytes)
+                if len(buffer) != layout.iq_bytes:
+                    return -2, [], []
+                I = uRAD_USB_SDK11.decodeIQ(buffer, layout.blocks)
+
+            if layout.get_Q:
+                buffer = self.ser.read(layout.iq_bytes)
+                if len(buffer) != layout.iq_bytes:
+                    return -2, [], []
+                Q = uRAD_USB_SDK11.decodeIQ(buffer, layout.blocks)
+        except Exception:
+            return -2, [], []
+
+        return 0, results, [I, Q]
+
+    def read_raw(self) -> typing.Tuple[int, memoryview]:
+        """
+        Request one frame and return its bytes as they came off the wire,
+        the frame buffer is reused by the next request
+        """
+        if self.layout is None:
+            return -1, self.frame
+
+        if len(self.frame) != self.layout.frame_bytes:
+            self._allocate_frame()
+
+        try:
+            if not self.ser.is_open:
+                return -1, self.frame
+
+            self.ser.write(bytearray([15]))
+            if not self._read_frame():
+                return -2, self.frame
+        except Exception:
+            return -2, self.frame
+
+        return 0, self.frame
+
+    def _detection_bulk(self) -> typing.Tuple[int, list, list]:
+        layout = self.layout
+
+        if not self._read_frame():
+            return -2, [], []
+
+        results = self._empty_results()
+        offset = layout.results_bytes
+        if offset:
+            results = uRAD_USB_SDK11.decodeResults(
+                self.frame[:offset], layout.Ntar,
+                layout.get_distance, layout.get_velocity,
+                layout.get_SNR, layout.get_movement
+            )
+
+        I = self._I
+        if layout.get_I:
+            I = uRAD_USB_SDK11.decodeIQ(self.frame[offset:offset + layout.iq_bytes], layout.blocks, I)
+            offset += layout.iq_bytes
+
+        Q = self._Q
+        if layout.get_Q:
+            Q = uRAD_USB_SDK11.decodeIQ(self.frame[offset:offset + layout.iq_bytes], layout.blocks, Q)
+
+        return 0, results, [I, Q]
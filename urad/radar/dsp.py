@@ -0,0 +1,148 @@
+"""
+Per-frame signal processing of the uRAD I/Q samples.
+
+Running the module compares the cost of a ``DSPPlan`` with the processing
+``URadRadar.run`` used to do inline for every frame:
+
+    python -m urad.radar.dsp
+"""
+import timeit
+import typing
+
+import numpy as np
+
+MAX_VOLTAGE = 3.3
+ADC_INTERVALS = 4096
+SPEED_OF_LIGHT = 299792458
+
+# FFT length to zero-pad to for a finer range grid
+N_FFT = 4096
+
+
+class Spectrum(typing.NamedTuple):
+    data_i: np.ndarray
+    data_q: np.ndarray
+    spectrum: np.ndarray
+    magnitude: np.ndarray
+    peak_index: int
+    peak_phase: float
+
+
+class DSPPlan:
+    """
+    Everything that only depends on the frame size, computed once per
+    configuration: the ADC scale and the Hanning window. ``process`` then
+    runs a single FFT whose result feeds both magnitude and phase.
+
+    ``Ns_ramp`` and ``BW`` (MHz) are the samples per ramp and the sweep
+    bandwidth, they map a target distance to its bin in the spectrum.
+    """
+    def __init__(self,
+                 Ns: int,
+                 n_fft: typing.Optional[int] = None,
+                 Ns_ramp: typing.Optional[int] = None,
+                 BW: float = 240
+                 ) -> None:
+        self.Ns = Ns
+        self.n_fft = n_fft or Ns
+        self.scale = MAX_VOLTAGE / ADC_INTERVALS
+        self.window = np.hanning(Ns) * 2 / MAX_VOLTAGE
+
+        # beat frequency of a target, in bins of this FFT per metre
+        self.bins_per_metre = 2 * BW * 1e6 / SPEED_OF_LIGHT * self.n_fft / (Ns_ramp or Ns)
+
+    @classmethod
+    def from_layout(cls, layout, n_fft: typing.Optional[int] = None) -> "DSPPlan":
+        return cls(sum(layout.blocks), n_fft, layout.Ns, layout.BW)
+
+    def range_bin(self, distance: float) -> int:
+        return int(round(distance * self.bins_per_metre)) % self.n_fft
+
+    def target_phases(self,
+                      spectrum: np.ndarray,
+                      distance: typing.Sequence[float],
+                      SNR: typing.Sequence[float]
+                      ) -> np.ndarray:
+        """
+        Phase at the range bin of every target reported by the radar,
+        NaN for the slots without a detected target
+        """
+        phases = np.full(len(distance), np.nan)
+
+        for i, (target_distance, target_SNR) in enumerate(zip(distance, SNR)):
+            if target_SNR <= 0:
+                continue
+
+            # the strongest of the neighbouring bins absorbs rounding errors
+            k = self.range_bin(target_distance)
+            neighbours = np.arange(k - 1, k + 2) % self.n_fft
+            k = neighbours[np.argmax(np.absolute(spectrum[neighbours]))]
+
+            phases[i] = np.angle(spectrum[k])
+
+        return phases
+
+    def process(self, I: np.ndarray, Q: np.ndarray) -> Spectrum:
+        data_i = np.multiply(I, self.scale)
+        data_i -= data_i.mean()
+        data_q = np.multiply(Q, self.scale)
+        data_q -= data_q.mean()
+
+        complex_vector = data_i + 1j * data_q
+        complex_vector *= self.window
+
+        spectrum = np.fft.fft(complex_vector, self.n_fft)
+        magnitude = 2 * np.absolute(spectrum)
+
+        peak_index = int(np.argmax(magnitude))
+        peak_phase = float(np.angle(spectrum[peak_index]))
+
+        return Spectrum(data_i, data_q, spectrum, magnitude, peak_index, peak_phase)
+
+
+def _inline_process(I: np.ndarray, Q: np.ndarray) -> tuple:
+    # what URadRadar.run did for every frame and target before DSPPlan
+    max_voltage = 3.3
+    ADC_intervals = 4096
+    Ns = np.size(I)
+
+    data_i = np.subtract(np.multiply(I, max_voltage/ADC_intervals), np.mean(np.multiply(I, max_voltage/ADC_intervals)))
+    data_q = np.subtract(np.multiply(Q, max_voltage/ADC_intervals), np.mean(np.multiply(Q, max_voltage/ADC_intervals)))
+    ComplexVector = data_i + 1j*data_q
+    ComplexVector = ComplexVector * np.hanning(Ns) * 2 / 3.3
+
+    FrequencyDomainComplex = 2 * np.absolute(np.fft.fft(ComplexVector))
+
+    max_fft = max(FrequencyDomainComplex)
+    index_fft = np.where(FrequencyDomainComplex == max_fft)[0][0]
+
+    phase = np.angle(np.fft.fft(ComplexVector))
+    return data_i, data_q, FrequencyDomainComplex, float(phase[index_fft])
+
+
+def benchmark(number: int = 2000) -> None:
+    rng = np.random.default_rng(0)
+
+    for Ns in (200, 400, 700):
+        I = rng.integers(0, 4096, Ns).astype(np.uint16)
+        Q = rng.integers(0, 4096, Ns).astype(np.uint16)
+        plan = DSPPlan(Ns)
+
+        data_i, data_q, magnitude, phase = _inline_process(I, Q)
+        result = plan.process(I, Q)
+        assert np.allclose(result.magnitude, magnitude) and np.isclose(result.peak_phase, phase)
+
+        inline = min(timeit.repeat(lambda: _inline_process(I, Q), number=number, repeat=3)) / number
+        planned = min(timeit.repeat(lambda: plan.process(I, Q), number=number, repeat=3)) / number
+        print(
+            f"Ns={Ns:<4} inline {inline * 1e6:7.1f} us/frame   "
+            f"plan {planned * 1e6:7.1f} us/frame   {inline / planned:4.1f}x"
+        )
+
+    plan = DSPPlan(200, N_FFT)
+    padded = min(timeit.repeat(lambda: plan.process(I[:200], Q[:200]), number=number, repeat=3)) / number
+    print(f"Ns=200 plan zero-padded to {N_FFT}: {padded * 1e6:7.1f} us/frame")
+
+
+if __name__ == "__main__":
+    benchmark()
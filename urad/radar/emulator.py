@@ -0,0 +1,321 @@
+"""
+Software stand-in for a uRAD USB radar.
+
+``EmulatedSerial`` behaves like an open ``serial.Serial`` connected to a
+radar: it answers the turn on/off (16/17), configuration (14) and detection
+(15) commands with the same ACKs, results packet and 12-bit packed I/Q
+blocks the real device sends, generated from a synthetic scene.
+``URadDevice`` uses it when the port is named ``emulator``.
+
+Running the module benchmarks the acquisition path against the emulator:
+
+    python -m urad.radar.emulator --seconds 5 --rate 0
+"""
+import argparse
+import math
+import struct
+import time
+import typing
+
+import numpy as np
+
+from urad import uRAD_USB_SDK11
+
+EMULATOR_PORT = "emulator"
+
+SPEED_OF_LIGHT = 299792458
+CARRIER_BASE = 24e9
+ADC_MAX = 4095
+
+
+class Reflector(typing.NamedTuple):
+    """
+    A point scatterer, its distance moves as a breathing and beating chest
+    when the rates are non zero
+    """
+    distance: float
+    amplitude: float = 0.3
+    breathing_rate: float = 0.0
+    breathing_depth: float = 0.0
+    heart_rate: float = 0.0
+    heart_depth: float = 0.0
+    SNR: float = 20.0
+
+    def distance_at(self, t: float) -> float:
+        return (
+            self.distance
+            + self.breathing_depth * math.sin(2 * math.pi * self.breathing_rate * t)
+            + self.heart_depth * math.sin(2 * math.pi * self.heart_rate * t)
+        )
+
+
+# a person breathing 15 times and beating 72 times a minute
+# in front of a wall and some furniture
+DEFAULT_SCENE = (
+    Reflector(1.2, 0.35, breathing_rate=0.25, breathing_depth=4e-3, heart_rate=1.2, heart_depth=3e-4, SNR=25),
+    Reflector(3.5, 0.15, SNR=12),
+    Reflector(6.0, 0.08, SNR=6),
+)
+
+
+def _pack_iq(samples: np.ndarray, blocks: typing.Sequence[int]) -> bytes:
+    """
+    Inverse of ``uRAD_USB_SDK11.decodeIQ``, odd ramps get a zero pad sample
+    """
+    padded = []
+    start = 0
+    for Ns_block in blocks:
+        padded.append(samples[start:start + Ns_block])
+        if Ns_block % 2:
+            padded.append(np.zeros(1, dtype=np.uint16))
+        start += Ns_block
+
+    pairs = np.concatenate(padded).astype(np.uint16).reshape(-1, 2)
+    packed = np.empty((len(pairs), 3), dtype=np.uint8)
+    packed[:, 0] = pairs[:, 0] >> 4
+    packed[:, 1] = ((pairs[:, 0] & 15) << 4) | (pairs[:, 1] >> 8)
+    packed[:, 2] = pairs[:, 1] & 255
+    return packed.tobytes()
+
+
+class EmulatedSerial:
+    """
+    In-process replacement for ``serial.Serial`` talking to a fake radar.
+
+    ``frame_rate`` caps how many detections per second the radar answers
+    (0 for as fast as possible) and, when ``simulate_baudrate`` is set, the
+    answer also takes as long as it would on the wire at ``baudrate``.
+    """
+    def __init__(self,
+                 scene: typing.Sequence[Reflector] = DEFAULT_SCENE,
+                 noise: float = 4.0,
+                 frame_rate: float = 0.0,
+                 simulate_baudrate: bool = True,
+                 seed: typing.Optional[int] = None
+                 ) -> None:
+        self.port = EMULATOR_PORT
+        self.baudrate = int(1e6)
+        self.bytesize = 8
+        self.parity = "N"
+        self.stopbits = 1
+        self.timeout = None
+
+        self.scene = tuple(scene)
+        self.noise = noise
+        self.frame_rate = frame_rate
+        self.simulate_baudrate = simulate_baudrate
+        self.rng = np.random.default_rng(seed)
+
+        self.is_open = False
+        self.is_on = False
+        self.configuration: typing.List[int] = []
+        self.frames_sent = 0
+
+        self._output = bytearray()
+        self._ready_at = 0.0
+        self._last_frame = 0.0
+        self._pending_configuration: typing.Optional[bytearray] = None
+        self._start = time.perf_counter()
+
+    def open(self) -> None:
+        self.is_open = True
+
+    def close(self) -> None:
+        self.is_open = False
+
+    @property
+    def in_waiting(self) -> int:
+        if time.perf_counter() < self._ready_at:
+            return 0
+        return len(self._output)
+
+    def reset_input_buffer(self) -> None:
+        self._output.clear()
+
+    def write(self, data) -> int:
+        for byte in bytes(data):
+            self._command(byte)
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        self._wait()
+        data = bytes(self._output[:size])
+        del self._output[:size]
+        return data
+
+    def readinto(self, buffer) -> int:
+        self._wait()
+        size = min(len(buffer), len(self._output))
+        buffer[:size] = self._output[:size]
+        del self._output[:size]
+        return size
+
+    def _wait(self) -> None:
+        delay = self._ready_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _reply(self, data: bytes, at: float = 0.0) -> None:
+        ready_at = max(time.perf_counter(), at)
+        if self._output:
+            ready_at = max(ready_at, self._ready_at)
+        if self.simulate_baudrate:
+            ready_at += len(data) * 10 / self.baudrate
+
+        self._ready_at = ready_at
+        self._output += data
+
+    def _command(self, byte: int) -> None:
+        if self._pending_configuration is not None:
+            self._pending_configuration.append(byte)
+            if len(self._pending_configuration) == 8:
+                self._configure(self._pending_configuration)
+                self._pending_configuration = None
+            return
+
+        if byte == 14:
+            self._pending_configuration = bytearray()
+        elif byte == 15:
+            self._detection()
+        elif byte == 16:
+            self.is_on = True
+            self._reply(b"\xaa")
+        elif byte == 17:
+            self.is_on = False
+            self._reply(b"\xaa")
+
+    def _configure(self, configuration: bytearray) -> None:
+        if sum(configuration[:7]) & 0b11111111 != configuration[7]:
+            return self._reply(b"\x00")
+
+        self.configuration = list(configuration)
+        self._reply(b"\xaa")
+
+    def _detection(self) -> None:
+        # the real radar stays silent when it is off or not configured
+        if not self.is_on or not self.configuration:
+            return
+
+        from urad.radar.device import FrameLayout
+        layout = FrameLayout.from_configuration(self.configuration)
+
+        now = time.perf_counter()
+        if self.frame_rate:
+            now = max(now, self._last_frame + 1 / self.frame_rate)
+        self._last_frame = now
+
+        t = now - self._start
+        frame = bytearray()
+        if layout.results_bytes:
+            frame += self._results(layout, t)
+        if layout.get_I or layout.get_Q:
+            I, Q = self._iq(layout, t)
+            if layout.get_I:
+                frame += _pack_iq(I, layout.blocks)
+            if layout.get_Q:
+                frame += _pack_iq(Q, layout.blocks)
+
+        self.frames_sent += 1
+        self._reply(bytes(frame), at=now)
+
+    def _results(self, layout, t: float) -> bytes:
+        NtarMax = uRAD_USB_SDK11.NtarMax
+        targets = sorted(self.scene, key=lambda r: r.amplitude, reverse=True)[:layout.Ntar]
+
+        distance = [0.0] * NtarMax
+        SNR = [0.0] * NtarMax
+        for i, target in enumerate(targets):
+            distance[i] = target.distance_at(t)
+            SNR[i] = target.SNR
+
+        movement = 255 if any(r.breathing_rate or r.heart_rate for r in targets) else 0
+
+        return (
+            struct.pack("<%df" % NtarMax, *distance)
+            + struct.pack("<%df" % NtarMax, *[0.0] * NtarMax)
+            + struct.pack("<%df" % NtarMax, *SNR)
+            + bytes([movement, 0])
+        )
+
+    def _iq(self, layout, t: float) -> typing.Tuple[np.ndarray, np.ndarray]:
+        wavelength = SPEED_OF_LIGHT / (CARRIER_BASE + layout.f0 * 1e6)
+        n = np.concatenate([np.arange(Ns_block) for Ns_block in layout.blocks])
+
+        signal = np.zeros(len(n), dtype=np.complex128)
+        for reflector in self.scene:
+            distance = reflector.distance_at(t)
+            # beat frequency in FFT bins of one ramp of Ns samples
+            beat_bin = 2 * distance * layout.BW * 1e6 / SPEED_OF_LIGHT
+            phase = 4 * math.pi * distance / wavelength
+            signal += reflector.amplitude * np.exp(1j * (2 * np.pi * beat_bin * n / layout.Ns + phase))
+
+        counts = signal * (ADC_MAX + 1) / 3.3
+        I = counts.real + ADC_MAX / 2 + self.rng.normal(0, self.noise, len(n))
+        Q = counts.imag + ADC_MAX / 2 + self.rng.normal(0, self.noise, len(n))
+
+        return (
+            np.clip(np.rint(I), 0, ADC_MAX).astype(np.uint16),
+            np.clip(np.rint(Q), 0, ADC_MAX).astype(np.uint16),
+        )
+
+
+def benchmark(seconds: float, frame_rate: float, mode: int, Ns: int, simulate_baudrate: bool) -> None:
+    from urad.radar.device import URadDevice
+    from urad.radar.pipeline import FrameRateMeter, FrameReader
+
+    def open_device(bulk_read: bool) -> URadDevice:
+        device = URadDevice(EMULATOR_PORT, bulk_read=bulk_read)
+        device.ser.frame_rate = frame_rate
+        device.ser.simulate_baudrate = simulate_baudrate
+        device.open()
+        device.turn_on()
+        device.configure(mode, 5, 240, Ns, 3, 100, 0, 0, 10, True, False, True, True, True, False)
+        return device
+
+    def report(name: str, latencies: typing.List[float], elapsed: float) -> None:
+        latencies_ms = np.array(latencies) * 1e3
+        print(
+            f"{name:<10} {len(latencies) / elapsed:8.1f} frames/s   latency "
+            f"mean {latencies_ms.mean():6.2f} ms  p99 {np.percentile(latencies_ms, 99):6.2f} ms"
+        )
+
+    for name, bulk_read in (("separate", False), ("bulk", True)):
+        device = open_device(bulk_read)
+        latencies = []
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            request = time.perf_counter()
+            return_code, _, _ = device.detection()
+            latencies.append(time.perf_counter() - request)
+            assert return_code == 0
+        report(name, latencies, time.perf_counter() - start)
+
+    device = open_device(True)
+    reader = FrameReader(device, FrameRateMeter())
+    reader.start()
+    latencies = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        request = time.perf_counter()
+        return_code, _, _, _ = reader.frames.get()
+        latencies.append(time.perf_counter() - request)
+        assert return_code == 0
+    elapsed = time.perf_counter() - start
+    reader.stop()
+    report("pipelined", latencies, elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark acquisition against the uRAD emulator")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--rate", type=float, default=0.0, help="radar frames/sec, 0 for unlimited")
+    parser.add_argument("--mode", type=int, default=2)
+    parser.add_argument("--ns", type=int, default=200)
+    parser.add_argument("--no-baudrate", action="store_true", help="do not simulate the 1 Mbaud link")
+    args = parser.parse_args()
+
+    benchmark(args.seconds, args.rate, args.mode, args.ns, not args.no_baudrate)
+
+
+if __name__ == "__main__":
+    main()
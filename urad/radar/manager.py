@@ -0,0 +1,173 @@
+"""
+Several radars and ultrasonic sensors captured at once.
+
+``DeviceManager`` gives every device a worker of its own: a thread running
+a ``RadarAcquisition``, or a child process with ``separate_process``, for
+each radar, and the reading thread of each ``UltrasonicSensor``. Every
+worker stamps its samples with ``urad.sync.now``, the monotonic clock of
+the host shared by all threads and processes, so the streams line up with
+``urad.sync.align`` without any further synchronisation.
+"""
+import functools
+import threading
+import typing
+
+from urad.buffers import RecordRing
+from urad.radar.acquisition import PROFILES, RadarAcquisition, RadarProfile
+from urad.radar.ultrasonic import UltrasonicSensor
+
+
+def split_ports(ports: typing.Union[str, typing.Sequence[str]]) -> typing.List[str]:
+    """
+    Ports of a setting such as ``"COM7, COM9"``, without the empty ones
+    """
+    if isinstance(ports, str):
+        ports = ports.split(",")
+
+    return [port.strip() for port in ports if port.strip()]
+
+
+class DeviceManager:
+    """
+    ``radar_ports`` and ``ultrasonic_ports`` opened together, with the
+    arguments and callbacks of ``RadarAcquisition``.
+
+    The ultrasonic sensors are streams of their own rather than a column of
+    one radar. The callbacks are called one at a time whichever worker
+    they come from: ``on_frames`` when any radar has new frames,
+    ``on_frame_rate`` with the sum over the radars, and ``on_vital_signs``
+    and ``on_time`` for the first radar, whose attributes (``frame_block``,
+    ``dsp``, ``peak_phase_series``, ...) are reachable from here for the
+    plots. ``publish`` serves the frames of the first radar.
+    """
+    def __init__(self,
+                 radar_ports: typing.Sequence[str],
+                 ultrasonic_ports: typing.Sequence[str] = (),
+                 duration: float = 0,
+                 profile: RadarProfile = PROFILES["default"],
+                 separate_process: bool = False,
+                 stream_history: int = 4096,
+                 publish: typing.Optional[str] = None,
+                 on_frames: typing.Optional[typing.Callable[[int], None]] = None,
+                 on_frame_rate: typing.Optional[typing.Callable[[float, float], None]] = None,
+                 on_vital_signs: typing.Optional[typing.Callable[[float, float], None]] = None,
+                 on_time: typing.Optional[typing.Callable[[int], None]] = None,
+                 on_finished: typing.Optional[typing.Callable[[], None]] = None,
+                 **kwargs
+                 ) -> None:
+        self.on_frames = on_frames
+        self.on_frame_rate = on_frame_rate
+        self.on_vital_signs = on_vital_signs
+        self.on_time = on_time
+        self.on_finished = on_finished
+
+        self.radars: typing.List[RadarAcquisition] = []
+        self.ultrasonics: typing.List[UltrasonicSensor] = []
+        self.workers: typing.List[threading.Thread] = []
+
+        radar_ports = split_ports(radar_ports)
+        self._frame_rates = [(0.0, 0.0)] * len(radar_ports)
+        self._lock = threading.Lock()
+
+        if separate_process:
+            from urad.radar.process import RadarProcess as acquisition
+        else:
+            acquisition = RadarAcquisition
+
+        try:
+            for i, port in enumerate(radar_ports):
+                self.radars.append(acquisition(
+                    port, "", duration, profile,
+                    stream_history=stream_history,
+                    publish=publish if i == 0 else None,
+                    name=f"radar{i + 1}",
+                    on_frames=self._callback("on_frames"),
+                    on_frame_rate=functools.partial(self._frame_rate, i),
+                    on_vital_signs=self._callback("on_vital_signs") if i == 0 else None,
+                    on_time=self._callback("on_time") if i == 0 else None,
+                    **kwargs
+                ))
+
+            for port in split_ports(ultrasonic_ports):
+                self.ultrasonics.append(UltrasonicSensor(port, stream_history))
+        except Exception:
+            for radar in self.radars:
+                radar.close()
+            self._stop_ultrasonics()
+            raise
+
+    def __getattr__(self, name: str) -> typing.Any:
+        if name == "radars" or not self.radars:
+            raise AttributeError(name)
+        return getattr(self.radars[0], name)
+
+    def _callback(self, name: str) -> typing.Callable:
+        def callback(*args):
+            function = getattr(self, name)
+            if function is not None:
+                with self._lock:
+                    function(*args)
+
+        return callback
+
+    def _frame_rate(self, radar: int, fps: float, serial_fps: float) -> None:
+        self._frame_rates[radar] = (fps, serial_fps)
+        if radar == 0 and self.on_frame_rate is not None:
+            with self._lock:
+                self.on_frame_rate(*map(sum, zip(*self._frame_rates)))
+
+    @property
+    def is_taking_data(self) -> bool:
+        return any(radar.is_taking_data for radar in self.radars)
+
+    @is_taking_data.setter
+    def is_taking_data(self, value: bool) -> None:
+        for radar in self.radars:
+            radar.is_taking_data = value
+
+    def streams(self) -> typing.Dict[str, typing.Tuple[RecordRing, dict]]:
+        """
+        The frames of every radar and the readings of every ultrasonic
+        sensor by stream name, with the configuration to record them with
+        """
+        streams = {}
+        for radar in self.radars:
+            streams.update(radar.streams())
+
+        for i, sensor in enumerate(self.ultrasonics):
+            streams[f"ultrasonic{i + 1}"] = (sensor.readings, {"device": "ultrasonic", "port": sensor.port})
+
+        return streams
+
+    def _stop_ultrasonics(self) -> None:
+        for sensor in self.ultrasonics:
+            sensor.stop()
+
+    def close(self) -> None:
+        """
+        Stop every radar, each one closes its port as its worker ends
+        """
+        self.is_taking_data = False
+
+    def run(self) -> None:
+        """
+        Capture with every radar until all of them have stopped
+        """
+        for radar in self.radars:
+            # a radar that did not take its configuration is closed already
+            if radar.frame_block is None:
+                continue
+
+            worker = threading.Thread(target=radar.run, name=radar.name, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+        # short waits, so that Ctrl+C reaches the main thread on Windows
+        for worker in self.workers:
+            while worker.is_alive():
+                worker.join(timeout=0.5)
+
+        self._stop_ultrasonics()
+
+        if self.on_finished is not None:
+            self.on_finished()
@@ -0,0 +1,104 @@
+import queue
+import time
+import typing
+from threading import Thread
+
+import numpy as np
+
+from urad.radar.device import URadDevice
+from urad.sync import now
+
+
+class FrameRateMeter:
+    """
+    Frame rate actually achieved, next to the rate a strictly serial
+    loop (read, then process) would get with the same timings
+    """
+    def __init__(self, smoothing: float = 0.1) -> None:
+        self.smoothing = smoothing
+        self.read_time = 0.0
+        self.process_time = 0.0
+        self.frame_interval = 0.0
+        self._last_frame: typing.Optional[float] = None
+
+    def _average(self, average: float, sample: float) -> float:
+        if not average:
+            return sample
+        return average + self.smoothing * (sample - average)
+
+    def add_read(self, seconds: float) -> None:
+        self.read_time = self._average(self.read_time, seconds)
+
+    def add_process(self, seconds: float) -> None:
+        self.process_time = self._average(self.process_time, seconds)
+
+    def tick(self) -> None:
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            self.frame_interval = self._average(self.frame_interval, now - self._last_frame)
+        self._last_frame = now
+
+    @property
+    def fps(self) -> float:
+        return 1 / self.frame_interval if self.frame_interval else 0.0
+
+    @property
+    def serial_fps(self) -> float:
+        total = self.read_time + self.process_time
+        return 1 / total if total else 0.0
+
+
+class FrameReader(Thread):
+    """
+    Keep requesting frames from the radar on a background thread, so the
+    next detection is already in flight while the previous frame is
+    processed. Frames wait in a bounded queue; when it is full the reader
+    blocks and the radar is not asked for more.
+
+    Every frame is queued with the host time it was received at.
+    """
+    def __init__(self,
+                 device: URadDevice,
+                 meter: FrameRateMeter,
+                 maxsize: int = 4,
+                 time_sleep: float = 0.0
+                 ) -> None:
+        super().__init__(daemon=True)
+
+        self.device = device
+        self.meter = meter
+        self.time_sleep = time_sleep
+        self.frames: "queue.Queue[tuple]" = queue.Queue(maxsize)
+        self.is_running = False
+
+    def run(self) -> None:
+        self.is_running = True
+
+        while self.is_running:
+            start = time.perf_counter()
+            return_code, results, raw_results = self.device.detection()
+            received = now()
+            self.meter.add_read(time.perf_counter() - start)
+
+            # the device reuses its buffers on the next detection
+            raw_results = [np.array(raw) for raw in raw_results]
+            self._put((return_code, results, raw_results, received))
+
+            if return_code != 0:
+                break
+
+            if self.time_sleep:
+                time.sleep(self.time_sleep)
+
+        self.is_running = False
+
+    def _put(self, frame: tuple) -> None:
+        while self.is_running:
+            try:
+                return self.frames.put(frame, timeout=0.1)
+            except queue.Full:
+                continue
+
+    def stop(self) -> None:
+        self.is_running = False
+        self.join()
@@ -0,0 +1,233 @@
+"""
+Radar acquisition in a child process.
+
+``RadarProcess`` runs ``RadarAcquisition`` in a process of its own, so the
+serial reads and the DSP do not wait for the GIL while the GUI redraws.
+The frames come back through a ``SharedRecordRing`` and the callbacks
+through a queue; they are called from the thread that runs
+``RadarProcess.run``.
+"""
+import multiprocessing
+import queue
+import signal
+import threading
+import typing
+
+from urad.buffers import SharedRecordRing, TimeSeriesBuffer
+from urad.radar.acquisition import PROFILES, RadarAcquisition, RadarProfile
+from urad.radar.dsp import DSPPlan
+from urad.recording import frame_dtype
+
+# spawned on every platform, a fork of the GUI would copy its Qt state
+_CONTEXT = multiprocessing.get_context("spawn")
+
+_CALLBACKS = ("frames", "frame_rate", "vital_signs", "time", "finished")
+
+
+def _forward(events: "multiprocessing.Queue", event: str) -> typing.Callable:
+    return lambda *args: events.put((event, args))
+
+
+def _watch(acquisition: RadarAcquisition, stop: "multiprocessing.Event") -> None:
+    # stops the radar when asked to, or when the GUI is gone
+    parent = multiprocessing.parent_process()
+    while not stop.wait(1.0):
+        if parent is not None and not parent.is_alive():
+            break
+
+    acquisition.is_taking_data = False
+
+
+def _acquire(events: "multiprocessing.Queue",
+             start: "multiprocessing.Event",
+             stop: "multiprocessing.Event",
+             args: tuple,
+             kwargs: dict
+             ) -> None:
+    """
+    Body of the child process
+    """
+    # Ctrl+C reaches the whole process group, the parent stops the child
+    # through ``stop`` so that the radar is closed properly
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    callbacks = {f"on_{event}": _forward(events, event) for event in _CALLBACKS}
+
+    try:
+        acquisition = RadarAcquisition(*args, **kwargs, **callbacks, shared_frames=True)
+    except Exception as e:
+        events.put(("error", (e,)))
+        return
+
+    # the radar did not take its configuration, "finished" is on its way
+    frame_block = acquisition.frame_block
+    if frame_block is None:
+        return
+
+    events.put(("ready", (acquisition.recording_configuration(), frame_block.name, frame_block.capacity)))
+
+    # run and close both end with the radar switched off
+    closed = False
+    try:
+        start.wait()
+        threading.Thread(target=_watch, args=(acquisition, stop), daemon=True).start()
+
+        if stop.is_set():
+            acquisition.close()
+        else:
+            acquisition.run()
+        closed = True
+    finally:
+        stop.set()
+        if not closed:
+            acquisition.close()
+        frame_block.close(unlink=True)
+
+
+class RadarProcess:
+    """
+    ``RadarAcquisition`` in a child process, with the same arguments and
+    callbacks.
+
+    The constructor returns once the radar is configured and raises what
+    the radar raised. ``frame_block`` maps the frames of the child,
+    ``peak_phase_series`` is filled from them; ``run`` starts the capture
+    and calls the callbacks until the child is done, then keeps a copy of
+    the frames and unmaps them.
+    """
+    def __init__(self,
+                 urad_port: str,
+                 ultrasonic_port: str = "",
+                 duration: float = 0,
+                 profile: RadarProfile = PROFILES["default"],
+                 phase_history: int = 99,
+                 stream_history: int = 4096,
+                 name: str = "",
+                 on_frames: typing.Optional[typing.Callable[[int], None]] = None,
+                 on_frame_rate: typing.Optional[typing.Callable[[float, float], None]] = None,
+                 on_vital_signs: typing.Optional[typing.Callable[[float, float], None]] = None,
+                 on_time: typing.Optional[typing.Callable[[int], None]] = None,
+                 on_finished: typing.Optional[typing.Callable[[], None]] = None,
+                 **kwargs
+                 ) -> None:
+        self.on_frames = on_frames
+        self.on_frame_rate = on_frame_rate
+        self.on_vital_signs = on_vital_signs
+        self.on_time = on_time
+        self.on_finished = on_finished
+
+        self.name = name
+        self.phase_history = phase_history
+        self.peak_phase_series = TimeSeriesBuffer(max(stream_history, phase_history))
+        self._phase_read = 0
+
+        self.frame_block: typing.Optional[SharedRecordRing] = None
+        self.dsp: typing.Optional[DSPPlan] = None
+        self.configuration: typing.Optional[dict] = None
+
+        self._events = _CONTEXT.Queue()
+        self._start = _CONTEXT.Event()
+        self._stop = _CONTEXT.Event()
+
+        kwargs.update(phase_history=phase_history, stream_history=stream_history, name=name)
+        self.process = _CONTEXT.Process(
+            target=_acquire,
+            args=(self._events, self._start, self._stop, (urad_port, ultrasonic_port, duration, profile), kwargs),
+            name="urad-acquisition",
+            daemon=True,
+        )
+        self.process.start()
+
+        event, args = self._next_event()
+        if event == "error":
+            self.process.join()
+            raise args[0]
+
+        if event != "ready":
+            return
+
+        self.configuration, memory_name, capacity = args
+        self.frame_block = SharedRecordRing(capacity, frame_dtype(
+            self.configuration["Ns_total"], self.configuration["n_fft"],
+            self.configuration["Ntar"], self.configuration["ultrasonic"]
+        ), memory_name)
+        self.dsp = DSPPlan(
+            self.configuration["Ns_total"], self.configuration["n_fft"],
+            self.configuration["Ns"], self.configuration["BW"]
+        )
+
+    @property
+    def is_taking_data(self) -> bool:
+        return not self._stop.is_set()
+
+    @is_taking_data.setter
+    def is_taking_data(self, value: bool) -> None:
+        if not value:
+            self._stop.set()
+            self._start.set()
+
+    def recording_configuration(self) -> dict:
+        return dict(self.configuration)
+
+    def streams(self) -> typing.Dict[str, typing.Tuple[SharedRecordRing, dict]]:
+        if self.frame_block is None:
+            return {}
+        return {self.name: (self.frame_block, self.recording_configuration())}
+
+    def _next_event(self) -> typing.Tuple[typing.Optional[str], tuple]:
+        """
+        Next event of the child, None once it has exited
+        """
+        while True:
+            try:
+                return self._events.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+            if not self.process.is_alive():
+                # what the child put just before exiting
+                try:
+                    return self._events.get(timeout=0.1)
+                except queue.Empty:
+                    return None, ()
+
+    def _frames(self, count: int) -> None:
+        records, self._phase_read, _ = self.frame_block.read_since(self._phase_read)
+        self.peak_phase_series.extend(records["time"], records["phase"])
+
+        if self.on_frames is not None:
+            self.on_frames(count)
+
+    def _detach(self) -> None:
+        # the records stay readable, the mapping of the child goes
+        if self.frame_block is not None:
+            self.frame_block.detach()
+
+    def close(self) -> None:
+        self.is_taking_data = False
+        self.process.join(timeout=5)
+        self._detach()
+
+    def run(self) -> None:
+        callbacks = {
+            "frames": self._frames,
+            "frame_rate": self.on_frame_rate,
+            "vital_signs": self.on_vital_signs,
+            "time": self.on_time,
+        }
+
+        self._start.set()
+        while True:
+            event, args = self._next_event()
+            if event is None or event == "finished":
+                break
+
+            callback = callbacks.get(event)
+            if callback is not None:
+                callback(*args)
+
+        self.process.join()
+        self._detach()
+
+        if self.on_finished is not None:
+            self.on_finished()
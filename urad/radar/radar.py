@@ -1,203 +1,95 @@
+import functools
 import typing
-import time
-
-import serial
-import numpy as np
 
 from PyQt5.QtCore import QObject, pyqtSignal
 
-from urad import uRAD_USB_SDK11
-from urad.contrib import Timer
-from urad.radar.ultrasonic import UltrasonicSensor
+from urad.radar.acquisition import PROFILES, RadarAcquisition, RadarProfile
 
 class URadRadar(QObject):
-    # data for ploting
-    phase_plot = pyqtSignal(np.ndarray)
-    magnitude_plot = pyqtSignal(np.ndarray)
+    """
+    ``RadarAcquisition`` for the GUI: its callbacks are these signals and
+    its attributes (``frame_block``, ``dsp``, ``peak_phase_series``, ...)
+    are reachable from here. With ``separate_process`` the acquisition is
+    a ``RadarProcess``, the frames are read from shared memory. Lists of
+    ports open every device at once through a ``DeviceManager``.
+    """
     time = pyqtSignal(int)
 
-    # data that to be save
-    magnitude_data = pyqtSignal(np.ndarray)
-    peek_phase = pyqtSignal(float)
-    i_data = pyqtSignal(np.ndarray)
-    q_data = pyqtSignal(np.ndarray)
-    ultrasonic_data = pyqtSignal(float)
+    # data that to be save: the count of frames written to frame_block,
+    # at most notify_rate times a second
+    frames_ready = pyqtSignal(int)
+
+    # breaths and beats per minute
+    vital_signs = pyqtSignal(float, float)
+
+    # achieved frames/sec and the rate of a serial read-then-process loop
+    frame_rate = pyqtSignal(float, float)
 
     # system signal
     finished = pyqtSignal()
 
     def __init__(self,
-                 urad_port: str,
-                 ultrasonic_port: str,
+                 urad_port: typing.Union[str, typing.Sequence[str]],
+                 ultrasonic_port: typing.Union[str, typing.Sequence[str]],
                  timer_sec: int = 0,
                  using_usb: bool = True,
+                 pipelined: bool = False,
+                 n_fft: typing.Optional[int] = None,
+                 multi_target: bool = True,
+                 phase_history: int = 99,
+                 stream_history: int = 4096,
+                 raw_capture: typing.Optional[str] = None,
+                 frame_block: int = 1024,
+                 notify_rate: float = 30.0,
+                 profile: RadarProfile = PROFILES["default"],
+                 separate_process: bool = False,
+                 publish: typing.Optional[str] = None,
                  parent: typing.Optional['QObject'] = None
                  ) -> None:
         super().__init__(parent)
 
-        # input parameters
-        mode = 2					# sawtooth mode
-        f0 = 5						# starting at 24.005 GHz
-        BW = 240					# using all the BW available = 240 MHz
-        Ns = 200					# 200 samples
-        Ntar = 3					# 3 target of interest
-        Rmax = 100					# searching along the full distance range
-        MTI = 0		    			# MTI mode disable because we want information of static and moving targets
-        Mth = 0			    		# parameter not used because "movement" is not requested
-        Alpha = 10					# signal has to be 10 dB higher than its surrounding
-        distance_true = True 		# request distance information
-        velocity_true = False		# mode 2 does not provide velocity information
-        SNR_true = True 			# Signal-to-Noise-Ratio information requested
-        I_true = True 				# In-Phase Component (RAW data) not requested
-        Q_true = True				# Quadrature Component (RAW data) not requested
-        movement_true = False 		# not interested in boolean movement detection
-        self.timeSleep = 5e-3       # Sleep Time (seconds) between iterations
-        self.is_taking_data = True
-
-        self.timer_sec = timer_sec
-
-        # True if USB, False if UART
-        self.usb_communication = using_usb
-
-        self.ser = serial.Serial()
-
-        if self.usb_communication:
-            self.ser.baudrate = int(1e6)
+        if not isinstance(urad_port, str) or not isinstance(ultrasonic_port, str):
+            from urad.radar.manager import DeviceManager
+            acquisition = functools.partial(DeviceManager, separate_process=separate_process)
+        elif separate_process:
+            from urad.radar.process import RadarProcess as acquisition
         else:
-            self.ser.baudrate = 115200
-
-        self.ser.port = urad_port
-        self.ser.bytesize = serial.EIGHTBITS
-        self.ser.parity = serial.PARITY_NONE
-        self.ser.stopbits = serial.STOPBITS_ONE
-
-        try:
-            self.ser.open()
-        except Exception:
-            self.close_radar()
-
-        # switch ON uRAD
-        return_code = uRAD_USB_SDK11.turnON(self.ser)
-        if return_code != 0:
-            return self.close_radar()
-
-        if not self.usb_communication:
-            time.sleep(self.timeSleep)
-
-        # loadConfiguration uRAD
-        return_code = uRAD_USB_SDK11.loadConfiguration(
-            self.ser, mode, f0, BW,
-            Ns, Ntar, Rmax, MTI, Mth, Alpha,
-            distance_true, velocity_true, SNR_true,
-            I_true, Q_true, movement_true
+            acquisition = RadarAcquisition
+
+        self.acquisition = acquisition(
+            urad_port, ultrasonic_port, timer_sec, profile,
+            using_usb=using_usb,
+            pipelined=pipelined,
+            n_fft=n_fft,
+            multi_target=multi_target,
+            phase_history=phase_history,
+            stream_history=stream_history,
+            raw_capture=raw_capture,
+            frame_block=frame_block,
+            publish=publish,
+            notify_rate=notify_rate,
+            on_frames=self.frames_ready.emit,
+            on_frame_rate=self.frame_rate.emit,
+            on_vital_signs=self.vital_signs.emit,
+            on_time=self.time.emit,
+            on_finished=self.finished.emit,
         )
 
-        if return_code != 0:
-            return self.close_radar()
-
-        if not self.usb_communication:
-            time.sleep(self.timeSleep)
-
-        # Setup radar perhiperal
-        send_raw_sec = lambda x: self.time.emit(x)
+    def __getattr__(self, name: str) -> typing.Any:
+        if name == "acquisition":
+            raise AttributeError(name)
+        return getattr(self.acquisition, name)
 
-        if ultrasonic_port:
-            self.ultrasonic = UltrasonicSensor(ultrasonic_port)
+    @property
+    def is_taking_data(self) -> bool:
+        return self.acquisition.is_taking_data
 
-        self.timer = Timer(timer_sec)
-        self.timer.time_lapsed_sec.connect(send_raw_sec)
+    @is_taking_data.setter
+    def is_taking_data(self, value: bool) -> None:
+        self.acquisition.is_taking_data = value
 
     def close_radar(self) -> None:
-        # switch OFF uRAD
-        uRAD_USB_SDK11.turnOFF(self.ser)
-
-        try:
-            self.ser.close()
-            self.ultrasonic.stop()
-        except Exception:
-            pass
-
-        self.timer.stop()
-        self.finished.emit()
+        self.acquisition.close()
 
     def run(self):
-        phase_plot_data = np.linspace(0, 0, 100)[:-1]
-        counter = 0
-
-        self.timer.start()
-        while self.is_taking_data:
-            if self.timer_sec != 0 and self.timer.sec_remain < 0:
-                break
-
-            # target detection request
-            return_code, results, raw_results = uRAD_USB_SDK11.detection(self.ser)
-            if return_code != 0:
-                return self.close_radar()
-
-            # Extract results from outputs
-            NtarDetected = results[0]
-            distance = results[1]
-            SNR = results[3]
-            I = raw_results[0]
-            Q = raw_results[1]
-            
-            # Iterate through desired targets
-            for i in range(NtarDetected):
-                # If SNR is not big enough
-                if (SNR[i] < 0):
-                    break
-
-                data_i = np.array(I)
-                data_q = np.array(Q)
-
-                max_voltage = 3.3
-                ADC_intervals = 4096
-                Ns = np.size(data_i)
-                Fs = 2
-
-                data_i = np.subtract(np.multiply(I, max_voltage/ADC_intervals), np.mean(np.multiply(I, max_voltage/ADC_intervals)))
-                data_q = np.subtract(np.multiply(Q, max_voltage/ADC_intervals), np.mean(np.multiply(Q, max_voltage/ADC_intervals)))
-                ComplexVector = data_i + 1j*data_q
-                ComplexVector = ComplexVector * np.hanning(Ns) * 2 / 3.3
-
-                N_FFT = 4096
-                FrequencyDomainComplex = 2 * np.absolute(np.fft.fft(ComplexVector))
-
-                max_fft = max(FrequencyDomainComplex)
-                index_fft = np.where(FrequencyDomainComplex == max_fft)[0][0]
-
-                phase = np.angle(np.fft.fft(ComplexVector))
-                size_fft = np.size(FrequencyDomainComplex)
-
-                phase_plot_data[-1] = float(phase[index_fft])
-
-                # Emit all the data to the GUI
-                self.i_data.emit(data_i)
-                self.q_data.emit(data_q)
-
-                if counter % 10 == 0:
-                    self.phase_plot.emit(phase_plot_data)
-                    self.magnitude_plot.emit(FrequencyDomainComplex)
-
-                self.magnitude_data.emit(FrequencyDomainComplex)
-                self.peek_phase.emit(float(phase[index_fft]))
-
-                try:
-                    self.ultrasonic_data.emit(self.ultrasonic.read())
-                except Exception:
-                    pass
-
-                phase_plot_data = np.append(phase_plot_data[1:], 0.0)
-
-            #  time.sleep(0.3)
-            counter += 1
-
-            #  # If number of detected targets is greater than 0 prints an empty line for a smarter output
-            if NtarDetected > 0:
-                continue
-
-            # Sleep during specified time
-            if not self.usb_communication:
-                time.sleep(self.timeSleep)
-
-        return self.close_radar()
+        return self.acquisition.run()
@@ -1,15 +1,49 @@
+import time
+import typing
 from threading import Thread
 
+import numpy as np
 import serial
 
+from urad.buffers import RecordRing, TimeSeriesBuffer
+from urad.sync import now
+
+# one reading of an ultrasonic stream, named like the fields of a radar frame
+READING_DTYPE = np.dtype([("time", "<f8"), ("ultrasonik", "<f8")])
+
 class UltrasonicSensor:
-    def __init__(self, port: str) -> None:
-        self.device = serial.Serial(port, 9800, timeout=1)
+    """
+    Distance readings of the ultrasonic sensor, one per line on the serial
+    port.
+
+    The reader thread waits for the first byte, then takes everything
+    already waiting in one read and parses all the complete lines of it, so
+    a burst of readings costs one wakeup. Every reading goes to ``history``
+    with the time its line ended, back-dated from the read by the bytes
+    that came after it, and to ``readings`` as a record for the readers of
+    the stream; lines that are not a number are counted in
+    ``parse_errors`` and skipped.
+    """
+    def __init__(self, port: str, history: int = 4096, timeout: float = 0.1) -> None:
+        self.port = port
+        self.device = serial.Serial(port, 9800, timeout=timeout)
         self.ultrasonic_data = 0
+        self._latest = (float("nan"), 0.0)
 
-        t = Thread(target=self._update)
-        t.daemon = True
-        t.start()
+        # every reading with the host time it was received at
+        self.history = TimeSeriesBuffer(history)
+        self.readings = RecordRing(history, READING_DTYPE)
+
+        self.samples = 0
+        self.parse_errors = 0
+        self.rate = 0.0
+        self._partial = b""
+        self._last_time = -np.inf
+
+        self.is_running = True
+        self._thread = Thread(target=self._update)
+        self._thread.daemon = True
+        self._thread.start()
 
     def _stop(self) -> None:
         self.stopped = True
@@ -17,21 +51,78 @@ class UltrasonicSensor:
     def read(self) -> float:
         return self.ultrasonic_data
 
-    def _update(self) -> None:
-        self.is_running = True
+    def read_stamped(self) -> typing.Tuple[float, float]:
+        """
+        Host time of the last reading and the reading itself
+        """
+        return self._latest
 
-        while self.is_running:
-            line = self.device.readline()
+    def _parse(self, data: bytes, received: float) -> None:
+        buffer = self._partial + data
+        lines = buffer.split(b"\n")
+        self._partial = lines.pop()
 
+        # a reading was received with its newline, the bytes after it in the
+        # same read took 10 bits each on the line
+        byte_time = 10 / self.device.baudrate
+        end = 0
+
+        times, values = [], []
+        for line in lines:
+            end += len(line) + 1
+            line = line.strip()
             if not line:
                 continue
 
-            data = line.decode().strip("\n")
-            self.ultrasonic_data = float(data.strip("\n"))
+            try:
+                value = float(line)
+            except ValueError:
+                self.parse_errors += 1
+                continue
+
+            stamp = max(received - (len(buffer) - end) * byte_time, self._last_time)
+            times.append(stamp)
+            values.append(value)
+            self._last_time = stamp
+
+        if not values:
+            return
+
+        self.history.extend(times, values)
+        for stamp, value in zip(times, values):
+            record = self.readings.next_record()
+            record["time"] = stamp
+            record["ultrasonik"] = value
+            self.readings.commit()
+
+        self.samples += len(values)
+        self.ultrasonic_data = values[-1]
+        self._latest = (times[-1], values[-1])
+
+    def _update(self) -> None:
+        last_report = time.perf_counter()
+        last_samples = 0
+
+        while self.is_running:
+            try:
+                # blocks until the first byte or the timeout
+                data = self.device.read(max(1, self.device.in_waiting))
+            except (serial.SerialException, OSError, TypeError):
+                break
+
+            if data:
+                self._parse(data, now())
+
+            elapsed = time.perf_counter() - last_report
+            if elapsed >= 1:
+                self.rate = (self.samples - last_samples) / elapsed
+                last_report += elapsed
+                last_samples = self.samples
 
     def stop(self) -> None:
         try:
             self.is_running = False
+            self._thread.join(self.device.timeout + 1)
             self.device.close()
         except AttributeError:
             pass
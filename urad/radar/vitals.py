@@ -0,0 +1,159 @@
+import math
+import typing
+
+import numpy as np
+
+from urad.buffers import RingBuffer
+
+# breathing and heart rate bands, Hz
+RESPIRATION_BAND = (0.1, 0.6)
+CARDIAC_BAND = (0.8, 2.5)
+
+
+class PhaseUnwrapper:
+    """
+    ``np.unwrap`` for one sample at a time
+    """
+    def __init__(self) -> None:
+        self.value: typing.Optional[float] = None
+        self._last = 0.0
+
+    def unwrap(self, phase: float) -> float:
+        if self.value is None:
+            self.value = phase
+        else:
+            delta = phase - self._last
+            self.value += delta - 2 * math.pi * round(delta / (2 * math.pi))
+
+        self._last = phase
+        return self.value
+
+
+class SlidingDFT:
+    """
+    Selected bins of the DFT of the last ``window`` samples, updated in
+    O(len(bins)) per sample. Rounding errors of the recursion are reset by
+    recomputing the bins directly once every ``window`` samples.
+    """
+    def __init__(self, window: int, bins: np.ndarray) -> None:
+        self.window = window
+        self.bins = np.asarray(bins)
+        self.samples = RingBuffer(window)
+        self.X = np.zeros(len(self.bins), dtype=np.complex128)
+
+        self._twiddle = np.exp(2j * np.pi * self.bins / window)
+        self._basis = np.exp(-2j * np.pi * np.outer(self.bins, np.arange(window)) / window)
+
+    @property
+    def is_full(self) -> bool:
+        return self.samples.count >= self.window
+
+    def update(self, x: float) -> None:
+        oldest = self.samples.view()[0]
+        self.samples.append(x)
+
+        if self.samples.count % self.window == 0:
+            self.X = self._basis @ self.samples.view()
+        else:
+            self.X = (self.X - oldest + x) * self._twiddle
+
+
+class VitalSignEstimator:
+    """
+    Breathing and heart rate from the peak phase of every frame.
+
+    The phase is unwrapped as it arrives and a sliding DFT keeps only the
+    bins of the respiration and cardiac bands over the last
+    ``window_sec`` seconds, so the cost per frame does not depend on how
+    long the capture has been running. Stamped frames are resampled to
+    ``sample_rate``, which only has to be close to the frame rate.
+    """
+    def __init__(self,
+                 sample_rate: float,
+                 window_sec: float = 20.0,
+                 respiration_band: typing.Tuple[float, float] = RESPIRATION_BAND,
+                 cardiac_band: typing.Tuple[float, float] = CARDIAC_BAND
+                 ) -> None:
+        self.sample_rate = sample_rate
+        self.window = max(4, int(round(window_sec * sample_rate)))
+        self.unwrapper = PhaseUnwrapper()
+
+        self._respiration = self._band_bins(respiration_band)
+        self._cardiac = self._band_bins(cardiac_band)
+        self.dft = SlidingDFT(self.window, np.concatenate([self._respiration, self._cardiac]))
+
+        # last stamped sample and the next time on the grid
+        self._last: typing.Optional[typing.Tuple[float, float]] = None
+        self._next_time = 0.0
+
+    def _band_bins(self, band: typing.Tuple[float, float]) -> np.ndarray:
+        low = max(1, math.ceil(band[0] * self.window / self.sample_rate))
+        high = min(self.window // 2, math.floor(band[1] * self.window / self.sample_rate))
+        return np.arange(low, high + 1)
+
+    def update(self, phase: float, timestamp: typing.Optional[float] = None) -> None:
+        """
+        Adds the phase of one frame. With its ``timestamp``, the unwrapped
+        phase is resampled onto a grid of ``sample_rate``, so frames that
+        come late or not at all do not stretch the window. A gap longer
+        than the window starts it over instead of filling it.
+        """
+        if timestamp is not None and self._last is not None:
+            if timestamp - self._last[0] > self.window / self.sample_rate:
+                self._restart()
+
+        value = self.unwrapper.unwrap(phase)
+        if timestamp is None:
+            self.dft.update(value)
+            return
+
+        if self._last is None:
+            self._last = (timestamp, value)
+            self._next_time = timestamp
+
+        last_time, last_value = self._last
+        while self._next_time <= timestamp:
+            if timestamp > last_time:
+                fraction = (self._next_time - last_time) / (timestamp - last_time)
+                self.dft.update(last_value + (value - last_value) * fraction)
+            else:
+                self.dft.update(value)
+            self._next_time += 1 / self.sample_rate
+
+        self._last = (timestamp, value)
+
+    def _restart(self) -> None:
+        self.unwrapper = PhaseUnwrapper()
+        self.dft = SlidingDFT(self.window, self.dft.bins)
+        self._last = None
+
+    def _peak_rate(self, magnitude: np.ndarray, bins: np.ndarray) -> float:
+        if not len(bins):
+            return math.nan
+
+        i = int(np.argmax(magnitude))
+        k = float(bins[i])
+
+        # parabolic interpolation between the neighbouring bins
+        if 0 < i < len(bins) - 1:
+            left, centre, right = magnitude[i - 1:i + 2]
+            denominator = left - 2 * centre + right
+            if denominator:
+                k += 0.5 * (left - right) / denominator
+
+        return k * self.sample_rate / self.window * 60
+
+    def rates(self) -> typing.Tuple[float, float]:
+        """
+        Breaths and beats per minute, NaN until the window is full
+        """
+        if not self.dft.is_full:
+            return math.nan, math.nan
+
+        magnitude = np.absolute(self.dft.X)
+        n_respiration = len(self._respiration)
+
+        return (
+            self._peak_rate(magnitude[:n_respiration], self._respiration),
+            self._peak_rate(magnitude[n_respiration:], self._cardiac),
+        )
@@ -0,0 +1,465 @@
+"""
+Recording of radar sessions to disk while the capture runs.
+
+Two formats are written: one CSV file per channel (``CSVRecorder``), or a
+single binary session file (``BinaryRecorder``) made of a JSON header with
+the radar configuration followed by fixed-size frame records, which
+``read_recording`` opens through ``np.memmap``. For archival captures
+``RawRecorder`` stores the packed frames as they came off the wire and
+``RawRecording`` decodes them on demand. Frames and ultrasonic readings are
+stamped with the host clock of ``urad.sync``, ``aligned_ultrasonic`` lines a
+session's readings up with its frames. A binary session converts to the
+CSV files with:
+
+    python -m urad.recording session.urad
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import queue
+import struct
+import time
+import typing
+from threading import Thread
+
+import numpy as np
+
+from urad import uRAD_USB_SDK11
+from urad.radar.device import FrameLayout
+from urad.radar.dsp import DSPPlan, Spectrum
+from urad.sync import align, unique_samples, wall_clock_offset
+
+_CLOSE = object()
+
+MAGIC = b"URADREC1"
+RAW_MAGIC = b"URADRAW1"
+HEADER_ALIGN = 64
+
+
+def _pack_header(magic: bytes, header: dict) -> bytes:
+    data = json.dumps(header).encode()
+    padding = -(len(magic) + 4 + len(data)) % HEADER_ALIGN
+    return magic + struct.pack("<I", len(data) + padding) + data + b" " * padding
+
+
+def _write_header(f: typing.IO, magic: bytes, header: dict) -> None:
+    f.write(_pack_header(magic, header))
+
+
+def _read_header(path: str, magic: bytes) -> typing.Tuple[dict, int]:
+    """
+    The JSON header of a session file and the offset of its first record
+    """
+    with open(path, "rb") as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError(f"{path} is not a radar session file")
+
+        (header_size,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_size))
+
+    return header, len(magic) + 4 + header_size
+
+
+def _clock_header() -> dict:
+    """
+    Timestamps are ``urad.sync.now``, adding the offset gives epoch seconds
+    """
+    return {"clock": "monotonic", "wall_clock_offset": wall_clock_offset()}
+
+
+def session_date() -> str:
+    """
+    Date in the file names of a session, the recorders of several devices
+    share one
+    """
+    return str(datetime.datetime.today()).replace(":", ".")
+
+
+def _memmap_records(path: str, dtype: np.dtype, offset: int) -> np.ndarray:
+    """
+    The complete records of a session file; the last one may still be
+    partly written, by a capture that is running or was cut short
+    """
+    count = (os.path.getsize(path) - offset) // dtype.itemsize
+    if count <= 0:
+        return np.empty(0, dtype=dtype)
+
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+
+
+class Recorder(Thread):
+    """
+    ``write_frames`` only queues the records; a background thread hands
+    them to the format and flushes to disk in chunks, so memory stays
+    bounded however long the capture is. ``close`` returns at once, the
+    thread writes what is left in the queue and closes the files.
+
+    A failure to write stops the thread and is kept in ``error``; the
+    batches queued after it are dropped instead of piling up.
+    """
+    def __init__(self,
+                 directory: str,
+                 chunk_size: int = 256,
+                 flush_interval: float = 1.0,
+                 maxsize: int = 10000,
+                 name: str = "",
+                 date: typing.Optional[str] = None
+                 ) -> None:
+        super().__init__(daemon=True)
+
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.date = date or session_date()
+
+        # the device of the stream, in the file names of a multi-device session
+        self.name = name
+        self._prefix = f"DATA_{name.upper()}_" if name else "DATA_"
+
+        self._queue: "queue.Queue[typing.Any]" = queue.Queue(maxsize)
+        self.error: typing.Optional[Exception] = None
+
+    def _put(self, item: typing.Any) -> None:
+        # waits for room while the thread writes, gives up once it failed
+        while self.error is None:
+            try:
+                self._queue.put(item, timeout=self.flush_interval)
+                return
+            except queue.Full:
+                pass
+
+    def write_frames(self, records: np.ndarray) -> None:
+        """
+        Queue a batch of ``frame_dtype`` records, one per frame
+        """
+        self._put(records)
+
+    def close(self) -> None:
+        self._put(_CLOSE)
+
+    def _append_frames(self, records: np.ndarray) -> int:
+        """
+        Take a batch of records, return how many rows are now pending
+        """
+        raise NotImplementedError
+
+    def _flush(self) -> None:
+        raise NotImplementedError
+
+    def _finish(self) -> None:
+        raise NotImplementedError
+
+    def run(self) -> None:
+        try:
+            self._write_queue()
+        except Exception as e:
+            self.error = e
+
+    def _write_queue(self) -> None:
+        last_flush = time.monotonic()
+
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            if item is _CLOSE:
+                break
+
+            pending = 0
+            if item is not None:
+                pending = self._append_frames(item)
+
+            if pending >= self.chunk_size or time.monotonic() - last_flush >= self.flush_interval:
+                self._flush()
+                last_flush = time.monotonic()
+
+        self._finish()
+
+
+class CSVRecorder(Recorder):
+    """
+    One ``DATA_<LABEL>_<date>.csv`` file per channel, one row per frame,
+    ``DATA_<NAME>_<LABEL>_<date>.csv`` for a named stream
+    """
+    def __init__(self, directory: str, **kwargs) -> None:
+        super().__init__(directory, **kwargs)
+
+        self._files: typing.Dict[str, typing.IO] = {}
+        self._writers: typing.Dict[str, typing.Any] = {}
+        self._chunks: typing.Dict[str, list] = {}
+        self._pending = 0
+
+    def path(self, label: str) -> str:
+        return f"{self.directory}/{self._prefix}{label.upper()}_{self.date}.csv"
+
+    def _append_frames(self, records: np.ndarray) -> int:
+        for label in records.dtype.names:
+            column = records[label]
+            self._chunks.setdefault(label, []).extend(column.reshape(len(column), -1).tolist())
+
+        self._pending += len(records)
+        return self._pending
+
+    def _flush(self) -> None:
+        for label, rows in self._chunks.items():
+            if not rows:
+                continue
+
+            if label not in self._files:
+                self._files[label] = open(self.path(label), "w+", newline="")
+                self._writers[label] = csv.writer(self._files[label], dialect="excel")
+
+            self._writers[label].writerows(rows)
+            self._files[label].flush()
+            rows.clear()
+
+        self._pending = 0
+
+    def _finish(self) -> None:
+        self._flush()
+        for f in self._files.values():
+            f.close()
+
+
+def frame_dtype(Ns: int, n_fft: int, Ntar: int, ultrasonic: bool = True) -> np.dtype:
+    """
+    One record of a binary session, fields are named after the CSV labels
+    """
+    fields = [
+        ("time", "<f8"),
+        ("i", "<f8", (Ns,)),
+        ("q", "<f8", (Ns,)),
+        ("magnitude", "<f8", (n_fft,)),
+        ("phase", "<f8"),
+        ("target_phase", "<f8", (Ntar,)),
+    ]
+    if ultrasonic:
+        fields += [("ultrasonik", "<f8"), ("ultrasonik_time", "<f8")]
+
+    return np.dtype(fields)
+
+
+class BinaryRecorder(Recorder):
+    """
+    A ``DATA_<date>.urad`` session file: the magic bytes, the length of a
+    JSON header holding the radar configuration and the record layout, the
+    header padded to 64 bytes, then one fixed-size record per frame.
+    ``time`` is the host time the frame was received at.
+
+    Other streams, such as the readings of an ultrasonic sensor, pass their
+    record ``dtype``; a ``name`` gives ``DATA_<NAME>_<date>.urad``.
+    """
+    def __init__(self,
+                 directory: str,
+                 configuration: dict,
+                 dtype: typing.Optional[np.dtype] = None,
+                 **kwargs
+                 ) -> None:
+        super().__init__(directory, **kwargs)
+
+        if dtype is None:
+            dtype = frame_dtype(
+                configuration["Ns_total"], configuration["n_fft"], configuration["Ntar"],
+                configuration.get("ultrasonic", True)
+            )
+        self.dtype = np.dtype(dtype)
+        self.header = dict(
+            configuration, name=self.name, date=self.date, dtype=self.dtype.descr, **_clock_header()
+        )
+
+        self._file: typing.Optional[typing.IO] = None
+
+    def path(self) -> str:
+        return f"{self.directory}/{self._prefix}{self.date}.urad"
+
+    def _append_frames(self, records: np.ndarray) -> int:
+        if self._file is None:
+            self._open()
+
+        # the file object buffers the writes until the next flush
+        self._file.write(records.astype(self.dtype, copy=False).tobytes())
+        return 0
+
+    def _open(self) -> None:
+        self._file = open(self.path(), "wb")
+        _write_header(self._file, MAGIC, self.header)
+
+    def _flush(self) -> None:
+        if self._file is None:
+            self._open()
+
+        self._file.flush()
+
+    def _finish(self) -> None:
+        self._flush()
+        if self._file is not None:
+            self._file.close()
+
+
+def read_recording(path: str) -> typing.Tuple[dict, np.memmap]:
+    """
+    The header and the frame records of a binary session, the records are
+    memory-mapped so any of them can be read without loading the file
+    """
+    header, offset = _read_header(path, MAGIC)
+    dtype = np.dtype([tuple(field) for field in header["dtype"]])
+
+    return header, _memmap_records(path, dtype, offset)
+
+
+def recording_to_csv(path: str, directory: typing.Optional[str] = None) -> typing.List[str]:
+    """
+    Write the CSV files ``CSVRecorder`` would have written for a binary
+    session, return their paths
+    """
+    header, records = read_recording(path)
+    directory = directory or os.path.dirname(path) or "."
+
+    name = header.get("name")
+    prefix = f"DATA_{name.upper()}_" if name else "DATA_"
+
+    paths = []
+    for label in records.dtype.names:
+        csv_path = f"{directory}/{prefix}{label.upper()}_{header['date']}.csv"
+        with open(csv_path, "w+", newline="") as f:
+            writer = csv.writer(f, dialect="excel")
+            column = records[label]
+            writer.writerows(column.reshape(len(column), -1).tolist())
+
+        paths.append(csv_path)
+
+    return paths
+
+
+def aligned_ultrasonic(records: np.ndarray,
+                       method: str = "nearest",
+                       tolerance: typing.Optional[float] = None,
+                       readings: typing.Optional[np.ndarray] = None
+                       ) -> np.ndarray:
+    """
+    The ultrasonic reading at the receive time of every frame of a binary
+    session, NaN where there is none. The readings come from the frames,
+    or from the session of an ultrasonic stream recorded next to them:
+    both are stamped on the same host clock.
+    """
+    if readings is not None:
+        # one record per reading already
+        times, values = readings["time"], readings["ultrasonik"]
+    elif "ultrasonik" in records.dtype.names:
+        times, values = unique_samples(records["ultrasonik_time"], records["ultrasonik"])
+    else:
+        return np.full(len(records), np.nan)
+
+    return align(records["time"], times, values, method, tolerance)
+
+
+def raw_frame_dtype(frame_bytes: int) -> np.dtype:
+    return np.dtype([("time", "<f8"), ("frame", "u1", (frame_bytes,))])
+
+
+class RawRecorder:
+    """
+    A ``RAW_<date>.urad`` capture, ``RAW_<NAME>_<date>.urad`` for a named
+    radar: the same header layout as a binary session, holding the
+    configuration register, then the host time (``urad.sync.now``) and the
+    untouched bytes the radar sent for every frame.
+
+    Nothing is decoded, queued or copied to another thread: ``append``
+    writes straight into the buffered file, from the acquisition loop.
+    """
+    def __init__(self,
+                 directory: str,
+                 configuration: typing.Sequence[int],
+                 frame_bytes: int,
+                 name: str = ""
+                 ) -> None:
+        self.date = session_date()
+        prefix = f"RAW_{name.upper()}_" if name else "RAW_"
+        self.path = f"{directory}/{prefix}{self.date}.urad"
+        self.header = {
+            "configuration": list(configuration),
+            "frame_bytes": frame_bytes,
+            "name": name,
+            "date": self.date,
+            **_clock_header(),
+        }
+
+        self._time = np.zeros(1, dtype="<f8")
+        self._file = open(self.path, "wb")
+        _write_header(self._file, RAW_MAGIC, self.header)
+
+    def append(self, timestamp: float, frame: typing.Union[bytes, memoryview]) -> None:
+        self._time[0] = timestamp
+        self._file.write(self._time)
+        self._file.write(frame)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class RawRecording:
+    """
+    Lazy reader of a raw capture, frames are only decoded and transformed
+    when asked for
+    """
+    def __init__(self, path: str, n_fft: typing.Optional[int] = None) -> None:
+        self.header, offset = _read_header(path, RAW_MAGIC)
+        self.layout = FrameLayout.from_configuration(self.header["configuration"])
+        self.records = _memmap_records(path, raw_frame_dtype(self.header["frame_bytes"]), offset)
+        self.dsp = DSPPlan.from_layout(self.layout, n_fft)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def time(self) -> np.ndarray:
+        return self.records["time"]
+
+    def frame(self, index: int) -> typing.Tuple[list, list]:
+        """
+        Same results and raw results ``URadDevice.detection`` returned
+        """
+        layout = self.layout
+        frame = self.records["frame"][index]
+
+        results = [0, [], [], [], False]
+        offset = layout.results_bytes
+        if offset:
+            results = uRAD_USB_SDK11.decodeResults(
+                frame[:offset].tobytes(), layout.Ntar,
+                layout.get_distance, layout.get_velocity,
+                layout.get_SNR, layout.get_movement
+            )
+
+        I = []
+        if layout.get_I:
+            I = uRAD_USB_SDK11.decodeIQ(frame[offset:offset + layout.iq_bytes], layout.blocks)
+            offset += layout.iq_bytes
+
+        Q = []
+        if layout.get_Q:
+            Q = uRAD_USB_SDK11.decodeIQ(frame[offset:offset + layout.iq_bytes], layout.blocks)
+
+        return results, [I, Q]
+
+    def spectrum(self, index: int) -> Spectrum:
+        _, (I, Q) = self.frame(index)
+        return self.dsp.process(I, Q)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert a binary radar session to CSV files")
+    parser.add_argument("path")
+    parser.add_argument("--out", help="directory of the CSV files, next to the session by default")
+    args = parser.parse_args()
+
+    for path in recording_to_csv(args.path, args.out):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
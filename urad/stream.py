@@ -0,0 +1,295 @@
+"""
+Live frames over a local socket, for other programs than the dashboard.
+
+``FramePublisher`` serves the processed frames of a running capture on a
+TCP address (``host:port``) or a Unix socket (a path). A client first gets
+the header of a binary session (magic ``URADSTR1``); after it, every
+message is the index of its first frame and the frame count (``<QI``),
+then that many ``frame_dtype`` records. Every client has a bounded queue:
+a client that does not keep up loses whole batches, the radar never waits
+for it. ``FrameSubscriber`` is the client side:
+
+    python -m urad.stream 127.0.0.1:5555
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import stat
+import struct
+import time
+import typing
+from threading import Lock, Thread
+
+import numpy as np
+
+from urad.recording import _clock_header, _pack_header
+
+MAGIC = b"URADSTR1"
+MESSAGE = struct.Struct("<QI")
+
+_CLOSE = object()
+
+
+def _socket_address(address: str) -> typing.Tuple[int, typing.Any]:
+    """
+    Socket family and address of ``host:port``, or of a Unix socket path
+    where the platform has them
+    """
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit():
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+    family = getattr(socket, "AF_UNIX", None)
+    if family is None:
+        raise ValueError(f"{address} is not a host:port address, Unix sockets are not available here")
+
+    return family, address
+
+
+def _remove_socket(path: str) -> None:
+    """
+    Removes the Unix socket file left at ``path``, and nothing else
+    """
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class _Client(Thread):
+    """
+    Sends the queued messages to one subscriber
+    """
+    def __init__(self, connection: socket.socket, header: bytes, queue_size: int) -> None:
+        super().__init__(daemon=True)
+
+        self.connection = connection
+        self.header = header
+        self.messages: "queue.Queue[typing.Any]" = queue.Queue(queue_size)
+        self.dropped = 0
+        self.is_connected = True
+
+    def send(self, message: bytes, frames: int) -> None:
+        try:
+            self.messages.put_nowait(message)
+        except queue.Full:
+            self.dropped += frames
+
+    def close(self) -> None:
+        # after the queued messages, or at once when the client is behind
+        try:
+            self.messages.put_nowait(_CLOSE)
+        except queue.Full:
+            self.is_connected = False
+
+    def run(self) -> None:
+        try:
+            self.connection.sendall(self.header)
+            while self.is_connected:
+                message = self.messages.get()
+                if message is _CLOSE:
+                    break
+                self.connection.sendall(message)
+        except OSError:
+            pass
+        finally:
+            self.is_connected = False
+            self.connection.close()
+
+
+class FramePublisher(Thread):
+    """
+    Accepts subscribers and fans every batch passed to ``publish`` out to
+    them. ``header`` is the radar configuration, as stored in a binary
+    session; ``queue_size`` is the number of batches a client may lag.
+    """
+    def __init__(self, address: str, dtype: np.dtype, header: dict, queue_size: int = 64) -> None:
+        super().__init__(daemon=True)
+
+        self.address = address
+        self.dtype = np.dtype(dtype)
+        self.header = _pack_header(MAGIC, dict(header, dtype=self.dtype.descr, **_clock_header()))
+        self.queue_size = queue_size
+        self.is_running = True
+
+        self.clients: typing.List[_Client] = []
+        self._lock = Lock()
+
+        self.family, self._address = _socket_address(address)
+        if self.family != socket.AF_INET:
+            _remove_socket(address)
+
+        self.server = socket.socket(self.family, socket.SOCK_STREAM)
+        if self.family == socket.AF_INET:
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        try:
+            self.server.bind(self._address)
+            self.server.listen()
+        except OSError:
+            self.server.close()
+            raise
+        self.server.settimeout(0.5)
+
+    @property
+    def dropped(self) -> int:
+        """
+        Frames not sent to the connected clients that were too slow
+        """
+        with self._lock:
+            return sum(client.dropped for client in self.clients)
+
+    def publish(self, records: np.ndarray, first_index: int) -> None:
+        if not len(records):
+            return
+
+        with self._lock:
+            self.clients = [client for client in self.clients if client.is_connected]
+            if not self.clients:
+                return
+            clients = list(self.clients)
+
+        # one message shared by every client
+        data = records.astype(self.dtype, copy=False).tobytes()
+        message = MESSAGE.pack(first_index, len(records)) + data
+        for client in clients:
+            client.send(message, len(records))
+
+    def close(self, timeout: float = 1.0) -> None:
+        """
+        Stop accepting clients and give the connected ones ``timeout``
+        seconds to receive what is queued for them
+        """
+        self.is_running = False
+        self.join(timeout)
+
+    def run(self) -> None:
+        while self.is_running:
+            try:
+                connection, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+
+            connection.settimeout(None)
+            if connection.family == socket.AF_INET:
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            client = _Client(connection, self.header, self.queue_size)
+            with self._lock:
+                self.clients.append(client)
+            client.start()
+
+        self.server.close()
+        if self.family != socket.AF_INET:
+            _remove_socket(self.address)
+
+        with self._lock:
+            clients = list(self.clients)
+
+        for client in clients:
+            client.close()
+        for client in clients:
+            client.join(1.0)
+
+
+class FrameSubscriber:
+    """
+    Client of a ``FramePublisher``:
+
+        with FrameSubscriber("127.0.0.1:5555") as stream:
+            for records in stream:
+                print(records["phase"])
+
+    ``header`` and ``dtype`` describe the frames, like ``read_recording``;
+    ``missed`` counts the frames the publisher dropped for this client.
+    """
+    def __init__(self, address: str, timeout: typing.Optional[float] = None) -> None:
+        family, socket_address = _socket_address(address)
+        self.connection = socket.socket(family, socket.SOCK_STREAM)
+        self.connection.settimeout(timeout)
+        self.connection.connect(socket_address)
+
+        if self._read(len(MAGIC)) != MAGIC:
+            self.close()
+            raise ValueError(f"{address} is not a radar frame stream")
+
+        (header_size,) = struct.unpack("<I", self._read(4))
+        self.header = json.loads(self._read(header_size))
+        self.dtype = np.dtype([tuple(field) for field in self.header["dtype"]])
+
+        self.missed = 0
+        self.next_index: typing.Optional[int] = None
+
+    def _read(self, size: int) -> bytearray:
+        data = bytearray(size)
+        view = memoryview(data)
+        while view:
+            received = self.connection.recv_into(view)
+            if not received:
+                raise EOFError("the radar stream has ended")
+            view = view[received:]
+
+        return data
+
+    def read(self) -> typing.Optional[np.ndarray]:
+        """
+        The next batch of frame records, None once the stream has ended
+        """
+        try:
+            first_index, count = MESSAGE.unpack(self._read(MESSAGE.size))
+            records = np.frombuffer(self._read(count * self.dtype.itemsize), dtype=self.dtype)
+        except EOFError:
+            return None
+
+        if self.next_index is not None:
+            self.missed += first_index - self.next_index
+        self.next_index = first_index + count
+
+        return records
+
+    def __iter__(self) -> typing.Iterator[np.ndarray]:
+        while True:
+            records = self.read()
+            if records is None:
+                return
+            yield records
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "FrameSubscriber":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Show the frame rate of a live radar stream")
+    parser.add_argument("address", help="host:port or Unix socket path of the publisher")
+    args = parser.parse_args()
+
+    with FrameSubscriber(args.address) as stream:
+        frames = 0
+        last_report = time.monotonic()
+
+        for records in stream:
+            frames += len(records)
+
+            current = time.monotonic()
+            if current - last_report >= 1:
+                print(
+                    f"{frames / (current - last_report):6.1f} frame/s  "
+                    f"{stream.missed} frame terlewat  phase {records['phase'][-1]:+.3f}"
+                )
+                frames = 0
+                last_report = current
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Aligning streams stamped with the host clock.
+
+Every radar frame and ultrasonic line is stamped with ``now()`` when it is
+received; ``align`` then resamples one stream at the timestamps of another,
+for live buffers as well as recorded sessions.
+"""
+import time
+import typing
+
+import numpy as np
+
+
+def now() -> float:
+    """
+    Host clock used for every stream, monotonic so it never jumps
+    """
+    return time.monotonic()
+
+
+def wall_clock_offset() -> float:
+    """
+    Add to a ``now()`` timestamp to get seconds since the epoch
+    """
+    return time.time() - now()
+
+
+def merge_index(query_times: np.ndarray, times: np.ndarray, tolerance: typing.Optional[float] = None) -> np.ndarray:
+    """
+    For every query time the index of the nearest of ``times`` (sorted),
+    -1 when there is none within ``tolerance``
+    """
+    query_times = np.asarray(query_times, dtype=np.float64)
+    times = np.asarray(times, dtype=np.float64)
+
+    if not len(times):
+        return np.full(query_times.shape, -1)
+
+    right = np.clip(np.searchsorted(times, query_times), 1, len(times) - 1)
+    left = right - 1
+    if len(times) == 1:
+        right = left = np.zeros_like(right)
+
+    index = np.where(np.abs(query_times - times[left]) <= np.abs(times[right] - query_times), left, right)
+
+    if tolerance is not None:
+        index[np.abs(times[index] - query_times) > tolerance] = -1
+
+    return index
+
+
+def align(query_times: np.ndarray,
+          times: np.ndarray,
+          values: np.ndarray,
+          method: str = "nearest",
+          tolerance: typing.Optional[float] = None
+          ) -> np.ndarray:
+    """
+    Values of a stream at ``query_times``, either the nearest sample or
+    interpolated linearly between the two around it. ``nearest`` holds the
+    first and last samples outside the stream, ``linear`` gives NaN there;
+    with both, query times farther than ``tolerance`` from a sample give
+    NaN.
+    """
+    query_times = np.asarray(query_times, dtype=np.float64)
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+
+    if method == "linear":
+        if not len(times):
+            return np.full(query_times.shape, np.nan)
+
+        aligned = np.interp(query_times, times, values, left=np.nan, right=np.nan)
+        if tolerance is not None:
+            aligned[merge_index(query_times, times, tolerance) < 0] = np.nan
+        return aligned
+
+    if method != "nearest":
+        raise ValueError(f"unknown alignment method: {method}")
+
+    index = merge_index(query_times, times, tolerance)
+    aligned = np.full(query_times.shape, np.nan)
+    aligned[index >= 0] = values[index[index >= 0]]
+    return aligned
+
+
+def unique_samples(times: np.ndarray, values: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    A stream recorded once per radar frame repeats its latest sample,
+    keep each sample once
+    """
+    times = np.asarray(times)
+    keep = ~np.isnan(times)
+    times, index = np.unique(times[keep], return_index=True)
+    return times, np.asarray(values)[keep][index]
@@ -4,6 +4,8 @@
 import math
 import struct
 
+import numpy as np
+
 global configuration, NtarMax, get_distance, get_velocity, get_SNR, get_I, get_Q, get_movement, results_packetLen
 NtarMax = 5
 get_distance = False
@@ -17,6 +19,38 @@ results_packetLen = NtarMax*3*4+2
 def loadConfiguration(ser, mode, f0, BW, Ns, Ntar, Rmax, MTI, Mth, Alpha, distance_true, velocity_true, SNR_true, I_true, Q_true, movement_true):
 
 	global configuration, get_distance, get_velocity, get_SNR, get_I, get_Q, get_movement
+	configuration = buildConfiguration(mode, f0, BW, Ns, Ntar, Rmax, MTI, Mth, Alpha, distance_true, velocity_true, SNR_true, I_true, Q_true, movement_true)
+
+	if (distance_true):
+		get_distance = True
+	if (velocity_true):
+		get_velocity = True
+	if (SNR_true):
+		get_SNR = True
+	if (I_true):
+		get_I = True
+	if (Q_true):
+		get_Q = True
+	if (movement_true):
+		get_movement = True
+
+	try:
+		if (ser.is_open):
+			ser.write(bytearray([14]))
+			ser.write(bytearray(configuration[0:8]))
+			configuration[5] = configuration[5] & 0b11111110
+			ACK = ser.read(1)
+			if (ACK[0] == 0xAA):
+				return 0
+			else:
+				return -1
+		else:
+			return -2
+	except:
+		return -3
+
+def buildConfiguration(mode, f0, BW, Ns, Ntar, Rmax, MTI, Mth, Alpha, distance_true, velocity_true, SNR_true, I_true, Q_true, movement_true):
+
 	configuration = [0] * 8
 
 	f0Min = 5
@@ -71,46 +105,40 @@ def loadConfiguration(ser, mode, f0, BW, Ns, Ntar, Rmax, MTI, Mth, Alpha, distan
 	configuration[6] = 0
 	if (distance_true):
 		configuration[6] += 0b10000000
-		get_distance = True
 	if (velocity_true):
 		configuration[6] += 0b01000000
-		get_velocity = True
 	if (SNR_true):
 		configuration[6] += 0b00100000
-		get_SNR = True
 	if (I_true):
 		configuration[6] += 0b00010000
-		get_I = True
 	if (Q_true):
 		configuration[6] += 0b00001000
-		get_Q = True
 	if (movement_true):
 		configuration[6] += 0b00000100
-		get_movement = True
 
 	CRC = ((configuration[0] + configuration[1] + configuration[2] + configuration[3] + configuration[4] + configuration[5] + configuration[6])) & 0b11111111
 	configuration[7] = CRC
 
-	try:
-		if (ser.is_open):
-			ser.write(bytearray([14]))
-			ser.write(bytearray(configuration[0:8]))
-			configuration[5] = configuration[5] & 0b11111110
-			ACK = ser.read(1)
-			if (ACK[0] == 0xAA):
-				return 0
-			else:
-				return -1
-		else:
-			return -2
-	except:
-		return -3
+	return configuration
 
-def detection(ser):
+def iqBlocks(mode, Ns):
+	# Sample count of every ramp sent in one I or Q buffer
+	blocks = [Ns]
+	if (mode == 3 or mode == 4):
+		blocks.append(Ns)
+	if (mode == 4):
+		Ns_3 = math.ceil(0.75*Ns)
+		blocks += [Ns_3, Ns_3]
+	return blocks
 
-	if (get_distance or get_velocity or get_SNR):
+def iqBytes(blocks):
+	# Ramps with an odd number of samples are padded to an even one
+	return int(sum(Ns_block + (Ns_block % 2) for Ns_block in blocks) * 1.5)
+
+def decodeResults(results, Ntar, distance_true, velocity_true, SNR_true, movement_true):
+
+	if (distance_true or velocity_true or SNR_true):
 		NtarDetected = 0
-		buff_temp = [0]*4
 		distance = [0]*NtarMax
 		velocity = [0]*NtarMax
 		SNR = [0]*NtarMax
@@ -122,124 +150,90 @@ def detection(ser):
 		SNR = []
 		movement = False
 
+	if (distance_true or velocity_true or SNR_true):
+		if (distance_true):
+			distance[0:Ntar] = struct.unpack('<%df' % Ntar, results[0:4*Ntar])
+		if (velocity_true):
+			velocity[0:Ntar] = struct.unpack('<%df' % Ntar, results[NtarMax*4:NtarMax*4+4*Ntar])
+		SNR[0:Ntar] = struct.unpack('<%df' % Ntar, results[2*NtarMax*4:2*NtarMax*4+4*Ntar])
+		NtarDetected = len([i for i in SNR if i > 0])
+		if (not SNR_true):
+			SNR = [0]*NtarMax
+	if (movement_true):
+		if (results[NtarMax*12] == 255):
+			movement = True
+
+	return [NtarDetected, distance, velocity, SNR, movement]
+
+def decodeIQ(buffer, blocks, out=None):
+	# Unpack 12-bit samples, two per 3 bytes, from the packed I or Q buffer.
+	# Each entry of blocks is the sample count of one ramp; an odd count is
+	# padded on the wire with one extra sample which is dropped here.
+	# buffer can be any bytes-like object, it is read without copying, and
+	# the samples are written into out when it is given.
+	triplets = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, 3)
+	padded = sum(blocks) != 2*len(triplets)
+	if (out is None or padded):
+		samples = np.empty((len(triplets), 2), dtype=np.uint16)
+	else:
+		samples = out.reshape(-1, 2)
+	np.left_shift(triplets[:, 0], 4, out=samples[:, 0], dtype=np.uint16)
+	samples[:, 0] |= triplets[:, 1] >> 4
+	np.left_shift(triplets[:, 1] & 15, 8, out=samples[:, 1], dtype=np.uint16)
+	samples[:, 1] |= triplets[:, 2]
+	samples = samples.ravel()
+	if (not padded):
+		return samples
+	keep = []
+	start = 0
+	for Ns_block in blocks:
+		keep.append(samples[start:start+Ns_block])
+		start += Ns_block + (Ns_block % 2)
+	return np.concatenate(keep, out=out)
+
+def detection(ser):
+
+	results = [0, [], [], [], False]
+	if (get_distance or get_velocity or get_SNR):
+		results[1:4] = [[0]*NtarMax, [0]*NtarMax, [0]*NtarMax]
+
 	if (get_I or get_Q):
 		mode = (configuration[0] & 0b11100000) >> 5
 		Ns = ((configuration[2] & 0b00011111) << 3) + ((configuration[3] & 0b11100000) >> 5)
-		Ns_temp = Ns
-		if (mode == 3):
-			Ns_temp *= 2
-		elif (mode == 4):
-			Ns_temp += Ns_temp + 2*math.ceil(0.75 * Ns_temp)
-		if (get_I):
-			I = [0]*Ns_temp
-		else:
-			I = []
-		if (get_Q):
-			Q = [0]*Ns_temp
-		else:
-			Q = []
+		blocks = iqBlocks(mode, Ns)
+		total_bytes = iqBytes(blocks)
 
-	else:
-		I = []
-		Q = []
+	I = []
+	Q = []
 
 	try:
 		if (ser.is_open):
 			ser.write(bytearray([15]))
 			if (get_distance or get_velocity or get_SNR or get_movement):
 				# Receive results
-				results = ser.read(results_packetLen)
-				if (len(results) == results_packetLen):
-					if (get_distance or get_velocity or get_SNR):
-						Ntar_temp = (configuration[3] & 0b00011100) >> 2
-						if (get_distance):
-							distance[0:Ntar_temp] = struct.unpack('<%df' % Ntar_temp, results[0:4*Ntar_temp])
-						if (get_velocity):
-							velocity[0:Ntar_temp] = struct.unpack('<%df' % Ntar_temp, results[NtarMax*4:NtarMax*4+4*Ntar_temp])
-						SNR[0:Ntar_temp] = struct.unpack('<%df' % Ntar_temp, results[2*NtarMax*4:2*NtarMax*4+4*Ntar_temp])
-						NtarDetected = len([i for i in SNR if i > 0])
-						if (not get_SNR):
-							SNR = [0]*NtarMax
-					if (get_movement):
-						if (results[NtarMax*12] == 255):
-							movement = True
+				bufferResults = ser.read(results_packetLen)
+				if (len(bufferResults) == results_packetLen):
+					Ntar_temp = (configuration[3] & 0b00011100) >> 2
+					results = decodeResults(bufferResults, Ntar_temp, get_distance, get_velocity, get_SNR, get_movement)
 				else:
 					return -2, [], []
 
 			# Receive I,Q
-			if (get_I or get_Q):
-				total_bytes = 0
-				if (Ns % 2 == 0):
-					total_bytes += Ns*1.5
-					two_blocks_1 = math.floor(Ns*1.5/3)
-				else:
-					total_bytes += (Ns+1)*1.5
-					two_blocks_1 = math.floor((Ns+1)*1.5/3)
-				if (mode == 3 or mode == 4):
-					two_blocks_2 = two_blocks_1
-					total_bytes *= 2
-				if (mode == 4):
-					Ns_3 = math.ceil(0.75*Ns)
-					if (Ns_3 % 2 == 0):
-						total_bytes += 2*Ns_3*1.5
-						two_blocks_3 = math.floor(Ns_3*1.5/3)
-					else:
-						total_bytes += 2*(Ns_3+1)*1.5
-						two_blocks_3 = math.floor((Ns_3+1)*1.5/3)
-
-				total_bytes = int(total_bytes)
-
 			if (get_I):
 				bufferIbytes = ser.read(total_bytes)
 				if (len(bufferIbytes) == total_bytes):
-					for i in range(two_blocks_1):
-						I[i*2+0] = (bufferIbytes[i*3+0] << 4) + (bufferIbytes[i*3+1] >> 4)
-						if (i*2+1 <= Ns-1):
-							I[i*2+1] = ((bufferIbytes[i*3+1] & 15) << 8) + bufferIbytes[i*3+2]
-					if (mode == 3 or mode == 4):
-						for i in range(two_blocks_2):
-							I[Ns+i*2+0] = (bufferIbytes[(two_blocks_1+i)*3+0] << 4) + (bufferIbytes[(two_blocks_1+i)*3+1] >> 4)
-							if (Ns+i*2+1 <= 2*Ns-1):
-								I[Ns+i*2+1] = ((bufferIbytes[(two_blocks_1+i)*3+1] & 15) << 8) + bufferIbytes[(two_blocks_1+i)*3+2]
-						if (mode == 4):
-							for i in range(two_blocks_3):
-								I[2*Ns+i*2+0] = (bufferIbytes[(two_blocks_1+two_blocks_2+i)*3+0] << 4) + (bufferIbytes[(two_blocks_1+two_blocks_2+i)*3+1] >> 4)
-								if (2*Ns+i*2+1 <= 2*Ns+Ns_3-1):
-									I[2*Ns+i*2+1] = ((bufferIbytes[(two_blocks_1+two_blocks_2+i)*3+1] & 15) << 8) + bufferIbytes[(two_blocks_1+two_blocks_2+i)*3+2]
-							for i in range(two_blocks_3):
-								I[2*Ns+Ns_3+i*2+0] = (bufferIbytes[(two_blocks_1+two_blocks_2+two_blocks_3+i)*3+0] << 4) + (bufferIbytes[(two_blocks_1+two_blocks_2+two_blocks_3+i)*3+1] >> 4)
-								if (2*Ns+Ns_3+i*2+1 <= 2*Ns+2*Ns_3-1):
-									I[2*Ns+Ns_3+i*2+1] = ((bufferIbytes[(two_blocks_1+two_blocks_2+two_blocks_3+i)*3+1] & 15) << 8) + bufferIbytes[(two_blocks_1+two_blocks_2+two_blocks_3+i)*3+2]
-
+					I = decodeIQ(bufferIbytes, blocks)
 				else:
 					return -2, [], []
 
 			if (get_Q):
 				bufferQbytes = ser.read(total_bytes)
 				if (len(bufferQbytes) == total_bytes):
-					for i in range(two_blocks_1):
-						Q[i*2+0] = (bufferQbytes[i*3+0] << 4) + (bufferQbytes[i*3+1] >> 4)
-						if (i*2+1 <= Ns-1):
-							Q[i*2+1] = ((bufferQbytes[i*3+1] & 15) << 8) + bufferQbytes[i*3+2]
-					if (mode == 3 or mode == 4):
-						for i in range(two_blocks_2):
-							Q[Ns+i*2+0] = (bufferQbytes[(two_blocks_1+i)*3+0] << 4) + (bufferQbytes[(two_blocks_1+i)*3+1] >> 4)
-							if (Ns+i*2+1 <= 2*Ns-1):
-								Q[Ns+i*2+1] = ((bufferQbytes[(two_blocks_1+i)*3+1] & 15) << 8) + bufferQbytes[(two_blocks_1+i)*3+2]
-						if (mode == 4):
-							for i in range(two_blocks_3):
-								Q[2*Ns+i*2+0] = (bufferQbytes[(two_blocks_1+two_blocks_2+i)*3+0] << 4) + (bufferQbytes[(two_blocks_1+two_blocks_2+i)*3+1] >> 4)
-								if (2*Ns+i*2+1 <= 2*Ns+Ns_3-1):
-									Q[2*Ns+i*2+1] = ((bufferQbytes[(two_blocks_1+two_blocks_2+i)*3+1] & 15) << 8) + bufferQbytes[(two_blocks_1+two_blocks_2+i)*3+2]
-							for i in range(two_blocks_3):
-								Q[2*Ns+Ns_3+i*2+0] = (bufferQbytes[(two_blocks_1+two_blocks_2+two_blocks_3+i)*3+0] << 4) + (bufferQbytes[(two_blocks_1+two_blocks_2+two_blocks_3+i)*3+1] >> 4)
-								if (2*Ns+Ns_3+i*2+1 <= 2*Ns+2*Ns_3-1):
-									Q[2*Ns+Ns_3+i*2+1] = ((bufferQbytes[(two_blocks_1+two_blocks_2+two_blocks_3+i)*3+1] & 15) << 8) + bufferQbytes[(two_blocks_1+two_blocks_2+two_blocks_3+i)*3+2]
-
+					Q = decodeIQ(bufferQbytes, blocks)
 				else:
 					return -2, [], []
 
-			return 0, [NtarDetected, distance, velocity, SNR, movement], [I, Q]
+			return 0, results, [I, Q]
 		else:
 			return -1, [], []
 	except: